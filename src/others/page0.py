@@ -5,8 +5,10 @@ def app():
     st.write("This is page 0")
 
     fms = FileManagerDynamic(ceiling_directory='30_TradingClub')
+    fms.warm_up([('data', 'folder')])
 
-    df = fms.load_data(folder_name='data', file_name='exchange_concat.csv')
+    df = fms.load_data(folder_name='data', file_name='exchange_concat.csv', use_cache=True,
+                       time_column='TimeStamp')
     configure_filters(df)
 
 
@@ -5,6 +5,7 @@ import time
 import streamlit as st
 
 from utils.file_manager import FileManagerDynamic
+from utils.utils import TimeWindowIndex
 
 pd.set_option('display.max_columns', None)
 pd.set_option('display.max_rows', None)
@@ -57,7 +58,7 @@ def create_initial_figure(df):
 
 
 def update_figure(df, current_time, next_time, fig):
-    filtered_df = df[(df['TimeStamp'] >= current_time) & (df['TimeStamp'] < next_time)]
+    filtered_df = TimeWindowIndex.for_dataset(df).window(current_time, next_time)
 
     if not filtered_df.empty:
         start_time = df['TimeStamp'].min()
@@ -130,7 +131,7 @@ def save_and_show_figure_in_html(fig):
 
 
 def app():
-    df = read_data_csv(file_name="exchange_concat.csv", folder_name="data")
+    df = read_data_csv(file_name="exchange_concat.csv", folder_name="data", use_cache=True)
     n_random_tickers = find_n_random_tickers(df, n=2)
     df_filtered = filter_dataframe_by_tickers(df, n_random_tickers)
 
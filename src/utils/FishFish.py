@@ -5,13 +5,354 @@ import pandas as pd
 import numpy as np
 import json
 import csv
+import math
+import heapq
+from concurrent.futures import ProcessPoolExecutor
+
+
+class DurationStats:
+    '''
+    Running mean and standard deviation of closed order durations (in seconds)
+
+    Welford's algorithm is used so each update is O(1) and no durations are kept in memory.
+    If decay is given (0 < decay <= 1), the stats are exponentially weighted instead and
+    decay is the weight of the newest duration.
+    '''
+    __slots__ = ('count', 'mean', 'm2', 'decay')
+
+    def __init__(self, decay=None):
+        if decay is not None and not 0 < decay <= 1:
+            raise ValueError(f"decay must be in (0, 1], got {decay}")
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.decay = decay
+
+    def update(self, value):
+        '''
+        Add a new duration to the running stats
+        '''
+        self.count += 1
+        delta = value - self.mean
+        if self.decay is None or self.count == 1:
+            self.mean += delta / self.count
+            self.m2 += delta * (value - self.mean)
+        else:
+            #Exponentially weighted mean and variance, m2 holds the variance directly
+            self.mean += self.decay * delta
+            self.m2 = (1 - self.decay) * (self.m2 + self.decay * delta * delta)
+
+    def std(self):
+        '''
+        Sample standard deviation (ddof=1), nan with less than two durations like np.std
+        '''
+        if self.count < 2:
+            return float('nan')
+        if self.decay is None:
+            return math.sqrt(self.m2 / (self.count - 1))
+        return math.sqrt(self.m2)
+
+
+def _timestamp_ns(value):
+    '''
+    Nanoseconds since epoch of a timestamp given as an int, a string or a datetime
+    '''
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    return pd.Timestamp(value).value
+
+
+class Event:
+    '''
+    One message of the dataset, lighter than a pd.Series row
+
+    timestamp: TimeStamp in nanoseconds since epoch (int)
+    timestamp_epoch: TimeStampEpoch (int)
+    direction, order_id, message_type, symbol, order_price, exchange: the other columns as is
+    '''
+    __slots__ = ('timestamp', 'timestamp_epoch', 'direction', 'order_id', 'message_type', 'symbol', 'order_price', 'exchange')
+
+    def __init__(self, timestamp, timestamp_epoch, direction, order_id, message_type, symbol, order_price, exchange):
+        self.timestamp = timestamp
+        self.timestamp_epoch = timestamp_epoch
+        self.direction = direction
+        self.order_id = order_id
+        self.message_type = message_type
+        self.symbol = symbol
+        self.order_price = order_price
+        self.exchange = exchange
+
+    @classmethod
+    def from_row(cls, row):
+        '''
+        Build an Event from a row of the dataset (pd.Series or dict)
+        '''
+        epoch = row['TimeStampEpoch']
+        return cls(_timestamp_ns(row['TimeStamp']), _timestamp_ns(epoch) if isinstance(epoch, (pd.Timestamp, np.datetime64)) else epoch,
+                   row['Direction'], row['OrderID'], row['MessageType'], row['Symbol'], row['OrderPrice'], row['Exchange'])
+
+    def __repr__(self):
+        return f"Event({', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)})"
+
+
+class NoveltyState:
+    '''
+    Statistics of one symbol on one exchange for NoveltyTracker
+    '''
+    __slots__ = ('count', 'last_time', 'highest_time_diff', 'novel')
+
+    def __init__(self, last_time):
+        self.count = 1
+        self.last_time = last_time
+        self.highest_time_diff = 0
+        self.novel = False
+
+
+class NoveltyTracker:
+    '''
+    State of novelSymbol in one slotted record per (exchange, symbol) instead of a dict per symbol per exchange
+
+    An update is one hash probe and a few attribute reads and writes. The novel symbols are kept apart from
+    the statistics, so no symbol name can collide with them.
+    '''
+    #A symbol can only be novel after more than MIN_ORDERS NewOrderRequest
+    MIN_ORDERS = 20
+
+    def __init__(self):
+        #(exchange, symbol) -> NoveltyState
+        self.states = {}
+        #exchange -> symbols flagged on it, and symbols flagged on any exchange
+        self.novel = {}
+        self.novel_any = set()
+
+    def update(self, event, warmup_end_ns):
+        '''
+        Update of novelSymbol for one event
+
+        Args:
+            event: Event of the dataset
+            warmup_end_ns: no symbol is flagged at or before this time (ns)
+        Returns:
+            True if the symbol is flagged as novel on the exchange of the event for the first time at this event
+        '''
+        key = (event.exchange, event.symbol)
+        state = self.states.get(key)
+        if state is None:
+            #Initialize the symbol
+            self.states[key] = NoveltyState(event.timestamp_epoch)
+            return False
+        if event.message_type != 'NewOrderRequest':
+            return False
+
+        time_diff = event.timestamp_epoch - state.last_time
+        state.last_time = event.timestamp_epoch
+        state.count += 1
+        if time_diff > state.highest_time_diff:
+            state.highest_time_diff = time_diff
+            if state.count > self.MIN_ORDERS and event.timestamp > warmup_end_ns and not state.novel:
+                state.novel = True
+                self.novel.setdefault(event.exchange, set()).add(event.symbol)
+                self.novel_any.add(event.symbol)
+                return True
+        return False
+
+    def is_novel(self, symbol, exchange=None):
+        '''
+        Whether symbol has been flagged, on exchange or on any exchange
+        '''
+        if exchange is None:
+            return symbol in self.novel_any
+        return symbol in self.novel.get(exchange, ())
+
+    def novel_symbols(self, exchange=None):
+        '''
+        Set of the symbols flagged on exchange (the Novelty set of novelSymbol), or on any exchange
+        '''
+        if exchange is None:
+            return set(self.novel_any)
+        return set(self.novel.get(exchange, ()))
+
+    @classmethod
+    def batch_flags(cls, df, warmup_end_ns):
+        '''
+        Vectorized path: for every row of df, whether its Symbol is novel on any exchange after that row,
+        the same as calling update on a new tracker for every row in order and checking is_novel
+
+        Args:
+            df: dataset in timestamp order within each exchange
+            warmup_end_ns: no symbol is flagged at or before this time (ns)
+        Returns:
+            boolean array with one value per row
+        '''
+        exchange_codes, _ = pd.factorize(df['Exchange'])
+        symbol_codes, _ = pd.factorize(df['Symbol'])
+        timestamp_ns = pd.to_datetime(df['TimeStamp']).to_numpy(dtype='datetime64[ns]').view('int64')
+        is_open = (df['MessageType'] == 'NewOrderRequest').to_numpy()
+        flagged_at = cls.first_novel_positions(exchange_codes, symbol_codes, is_open,
+                                               Exchange._epoch_values(df['TimeStampEpoch']), timestamp_ns, warmup_end_ns)
+        return np.arange(len(df)) >= flagged_at[symbol_codes] if len(df) else np.zeros(0, dtype=bool)
+
+    @staticmethod
+    def first_novel_positions(exchange_codes, symbol_codes, is_open, epochs, timestamp_ns, warmup_end_ns):
+        '''
+        Batch version of novelSymbol
+
+        The first message of a symbol on an exchange initializes it and each following NewOrderRequest is
+        counted. A symbol is novel when the time since its previous NewOrderRequest beats its highest so far
+        after more than MIN_ORDERS of them (and after the warmup).
+
+        Returns:
+            array with, for every Symbol code, the first position where it is in a Novelty set
+            (len(timestamp_ns) if never)
+        '''
+        n_rows = len(timestamp_ns)
+        if not n_rows:
+            return np.zeros(0, dtype=np.int64)
+        flagged_at = np.full(symbol_codes.max() + 1, n_rows)
+
+        group = exchange_codes.astype(np.int64) * (symbol_codes.max() + 1) + symbol_codes
+        first_of_group = ~pd.Series(group).duplicated().to_numpy()
+        events = np.flatnonzero(first_of_group | is_open)
+        events = events[np.argsort(group[events], kind='stable')]
+        event_group = group[events]
+        group_start = np.r_[True, event_group[1:] != event_group[:-1]]
+
+        time_diff = np.r_[0, np.diff(epochs[events])]
+        time_diff[group_start] = 0
+        highest = pd.Series(time_diff).groupby(event_group).cummax().to_numpy()
+        previous_highest = np.r_[0, highest[:-1]]
+        count = pd.Series(event_group).groupby(event_group).cumcount().to_numpy() + 1
+
+        novel = ~group_start & (time_diff > previous_highest) & (count > NoveltyTracker.MIN_ORDERS) & (timestamp_ns[events] > warmup_end_ns)
+        np.minimum.at(flagged_at, symbol_codes[events[novel]], events[novel])
+        return flagged_at
+
+
+class FrequencyCounter:
+    '''
+    Message counts per time bucket and message type of every exchange, in dense 2-D arrays
+
+    TimeStampEpoch is bucketed by integer division over a fixed session window, every exchange gets one
+    (bucket x message type) array of counts, so an update is one index computation and one increment.
+    Coarser granularities are rolled up from the counts without going back to the messages.
+    '''
+
+    def __init__(self, granularity='1s', start=None, end=None, message_types=None):
+        '''
+        granularity: time interval of the buckets
+        start, end: session window, messages outside of [start, end] are not counted
+            (Exchange.FREQUENCY_INTERVAL_START/END by default)
+        message_types: columns of the counts, other message types get a column when first seen
+            (Exchange.FREQUENCY_MESSAGE_TYPES by default)
+        '''
+        self.granularity = pd.Timedelta(granularity)
+        self.granularity_ns = self.granularity.value
+        self.start_ns = pd.Timestamp(Exchange.FREQUENCY_INTERVAL_START if start is None else start).value
+        self.end_ns = pd.Timestamp(Exchange.FREQUENCY_INTERVAL_END if end is None else end).value
+        #Buckets are floored on the epoch like price_frequency, the first one holds start
+        self.first_bucket = self.start_ns // self.granularity_ns
+        self.n_buckets = self.end_ns // self.granularity_ns - self.first_bucket + 1
+        self.message_types = list(Exchange.FREQUENCY_MESSAGE_TYPES if message_types is None else message_types)
+        self.message_type_ids = {message_type: i for i, message_type in enumerate(self.message_types)}
+        #exchange -> counts array (n_buckets x number of message types)
+        self.counts = {}
+
+    def _message_type_id(self, message_type):
+        message_type_id = self.message_type_ids.get(message_type)
+        if message_type_id is None:
+            message_type_id = self.message_type_ids[message_type] = len(self.message_types)
+            self.message_types.append(message_type)
+            for exchange, counts in self.counts.items():
+                self.counts[exchange] = np.pad(counts, ((0, 0), (0, 1)))
+        return message_type_id
+
+    def _exchange_counts(self, exchange):
+        counts = self.counts.get(exchange)
+        if counts is None:
+            counts = self.counts[exchange] = np.zeros((self.n_buckets, len(self.message_types)), dtype=np.int64)
+        return counts
+
+    def update(self, event):
+        '''
+        Count one Event (price_frequency)
+        '''
+        epoch = event.timestamp_epoch
+        if self.start_ns <= epoch <= self.end_ns:
+            message_type_id = self._message_type_id(event.message_type)
+            self._exchange_counts(event.exchange)[epoch // self.granularity_ns - self.first_bucket, message_type_id] += 1
+
+    def update_frame(self, df):
+        '''
+        Count every row of a DataFrame at once
+        '''
+        epochs = Exchange._epoch_values(df['TimeStampEpoch'])
+        in_window = (epochs >= self.start_ns) & (epochs <= self.end_ns)
+        buckets = epochs[in_window] // self.granularity_ns - self.first_bucket
+        message_type_codes, message_type_values = pd.factorize(df['MessageType'].to_numpy()[in_window])
+        message_type_ids = np.array([self._message_type_id(message_type) for message_type in message_type_values], dtype=np.int64)
+        exchange_codes, exchanges = pd.factorize(df['Exchange'].to_numpy()[in_window])
+        n_types = len(self.message_types)
+        for code, exchange in enumerate(exchanges):
+            rows = exchange_codes == code
+            flat = buckets[rows] * n_types + message_type_ids[message_type_codes[rows]]
+            self._exchange_counts(exchange)[...] += np.bincount(flat, minlength=self.n_buckets * n_types).reshape(self.n_buckets, n_types)
+
+    def rollup(self, granularity):
+        '''
+        FrequencyCounter at a coarser granularity (a multiple of this one), summed from the counts
+
+        Args:
+            granularity: the new time interval, e.g. '1s' or '1min' from '1ms'
+        Returns:
+            FrequencyCounter with the same session window and message types
+        '''
+        rolled = FrequencyCounter(granularity, self.start_ns, self.end_ns, self.message_types)
+        if rolled.granularity_ns % self.granularity_ns:
+            raise ValueError(f"{granularity} is not a multiple of {self.granularity}")
+        #Coarse bucket of every fine bucket, both floored on the epoch
+        coarse = (self.first_bucket + np.arange(self.n_buckets)) * self.granularity_ns // rolled.granularity_ns - rolled.first_bucket
+        boundaries = np.flatnonzero(np.r_[True, coarse[1:] != coarse[:-1]])
+        for exchange, counts in self.counts.items():
+            rolled_counts = rolled._exchange_counts(exchange)
+            rolled_counts[coarse[boundaries]] = np.add.reduceat(counts, boundaries, axis=0)
+        return rolled
+
+    def table(self):
+        '''
+        Counts as a DataFrame like Exchange.price_frequency_table: indexed by (Exchange, TimeKey), one
+        column per message type, only the buckets with messages
+        '''
+        bucket_times = pd.to_datetime((self.first_bucket + np.arange(self.n_buckets)) * self.granularity_ns)
+        tables = []
+        for exchange, counts in self.counts.items():
+            used = np.flatnonzero(counts.any(axis=1))
+            index = pd.MultiIndex.from_arrays([np.full(len(used), exchange, dtype=object), bucket_times[used]], names=['Exchange', 'TimeKey'])
+            tables.append(pd.DataFrame(counts[used], index=index, columns=self.message_types))
+        if not tables:
+            return pd.DataFrame(columns=self.message_types, index=pd.MultiIndex.from_arrays([[], []], names=['Exchange', 'TimeKey']))
+        return pd.concat(tables).sort_index()
 
 
 class Exchange:
-    def __init__(self, dataset):
+    #Session window used by price_frequency
+    FREQUENCY_INTERVAL_START = pd.to_datetime('2024-01-05 09:28:00.000000')
+    FREQUENCY_INTERVAL_END = pd.to_datetime('2024-01-05 09:32:00.000000')
+    #Message types counted in every frequency bucket
+    FREQUENCY_MESSAGE_TYPES = ['NewOrderRequest', 'NewOrderAcknowledged', 'Cancelled', 'CancelRequest', 'Trade', 'Rejected']
+
+    def __init__(self, dataset, streaming_stats=False, decay=None, indexed_open_orders=True,
+                 stddev_multiplier=1, warmup=pd.Timedelta(1, unit='m'), pattern_counter=None):
         '''
         init function for the class
         dataset: timeseries order by timestamp
+        streaming_stats: keep running duration stats per exchange (DurationStats) instead of the full Closed Durations list
+        decay: optional weight of the newest duration for exponentially decayed stats (streaming_stats only)
+        indexed_open_orders: keep open orders in a heap ordered by open timestamp so only the oldest ones are checked,
+            False goes back to scanning every open order on each row
+        stddev_multiplier: an open order is flagged once open for longer than the average duration + stddev_multiplier * stddev
+        warmup: no order or symbol is flagged before firsttimestamp + warmup
+        pattern_counter: optional OnlinePatternCounter (utils.find_patterns) fed every event seen by update_exchanges,
+            to share one live pattern state with the app
       
         Columns:
         
@@ -24,37 +365,76 @@ class Exchange:
         OrderPrice: Price of the order (except cancel trades)
         Exchange: Exchange where the order was sent
         '''
+        if decay is not None and not streaming_stats:
+            raise ValueError("decay needs streaming_stats=True, the Closed Durations list gives undecayed stats.")
         self.dataset = dataset
-        TimeStamp=dataset['TimeStamp']
-        TimeStampEpoch=dataset['TimeStampEpoch']
-        Direction=dataset['Direction']
-        OrderID=dataset['OrderID']
-        MessageType=dataset['MessageType']
-        Symbol=dataset['Symbol']
-        OrderPrice=dataset['OrderPrice']
-        Exchange=dataset['Exchange']
-        
-        #Big Dictionary
-        self.BigDict=dataset.to_dict(orient='index')
-        
-        
-        
+        self.streaming_stats = streaming_stats
+        self.decay = decay
+        self.indexed_open_orders = indexed_open_orders
+        self.stddev_multiplier = stddev_multiplier
+        self.warmup = pd.Timedelta(warmup)
+        self._warmup_end = (None, None)
+        self._granularity_ns = {}
+        self.pattern_counter = pattern_counter
+
+    def events(self, df=None, chunk_size=100_000):
+        '''
+        Iterate over the rows of a dataset as Event records
+
+        Columns are converted a chunk at a time, so the dataset is never copied as a whole into Python objects.
+
+        Args:
+            df: dataset to iterate over (the dataset given at init by default)
+            chunk_size: number of rows converted at once
+        Returns:
+            generator of Event
+        '''
+        if df is None:
+            df = self.dataset
+        for start in range(0, len(df), chunk_size):
+            chunk = df.iloc[start:start + chunk_size]
+            timestamps = pd.to_datetime(chunk['TimeStamp']).to_numpy(dtype='datetime64[ns]').view('int64').tolist()
+            epochs = self._epoch_values(chunk['TimeStampEpoch']).tolist()
+            columns = [chunk[column].tolist() for column in ('Direction', 'OrderID', 'MessageType', 'Symbol', 'OrderPrice', 'Exchange')]
+            for values in zip(timestamps, epochs, *columns):
+                yield Event(*values)
+
+    def _warmup_end_ns(self, firsttimestamp):
+        '''
+        firsttimestamp + warmup in nanoseconds, cached since the drivers pass the same firsttimestamp on every row
+        '''
+        if self._warmup_end[0] is None or self._warmup_end[0] != firsttimestamp:
+            self._warmup_end = (firsttimestamp, _timestamp_ns(firsttimestamp) + self.warmup.value)
+        return self._warmup_end[1]
+
     def update_exchanges(self, existing_stats, new_row,firsttimestamp):
         '''
-        Function to update the exchange stats and fish out trades that exceed 10 stdev of the average duration
+        Function to update the exchange stats and fish out trades that exceed stddev_multiplier stdev of the average duration
         
         Args:
             existing_stats: Dictionary containing the exchange stats
-            new_row: new row of the dataset
+            new_row: new row of the dataset (Event, or a row of the DataFrame)
         Returns:
             existing_stats: Updated dictionary containing the exchange stats
         '''
-        exchange = new_row['Exchange']
-        order_id = new_row['OrderID']
-        message_type = new_row['MessageType']
-        timestamp = pd.to_datetime(new_row['TimeStamp'])
-        new_row['TimeStamp']=pd.to_datetime(new_row['TimeStamp'])
-        
+        event = new_row if isinstance(new_row, Event) else Event.from_row(new_row)
+        if self.pattern_counter is not None:
+            self.pattern_counter.update_event(event)
+        self._update_exchange_stats(existing_stats, event, self._warmup_end_ns(firsttimestamp))
+        return existing_stats
+
+    def _update_exchange_stats(self, existing_stats, event, warmup_end_ns):
+        '''
+        One event of update_exchanges (also driven by StaleOrderRule of detector_pipeline)
+
+        Returns:
+            list of the OrderIDs flagged at this event
+        '''
+        exchange = event.exchange
+        order_id = event.order_id
+        message_type = event.message_type
+        timestamp = event.timestamp
+
         if exchange not in existing_stats:
             existing_stats[exchange] = {
                 'Order Sent': 0,
@@ -66,104 +446,134 @@ class Exchange:
                 'Duration StdDev': pd.Timedelta(0),
                 'Flagged Trades': set()#Sets are faster lol
             }
+        closed_duration = None
         #Initilize the trade
         if message_type == 'NewOrderRequest':
             existing_stats[exchange]['Order Sent'] += 1
             existing_stats[exchange]['Open Orders'][order_id] = timestamp
+            if self.indexed_open_orders and 'Open Order Index' in existing_stats[exchange]:
+                heapq.heappush(existing_stats[exchange]['Open Order Index'], (timestamp, order_id))
         #Close the trade an update stats
         elif message_type in ['Cancelled','Rejected']:
             if order_id in existing_stats[exchange]['Open Orders']:
                 start_timestamp = existing_stats[exchange]['Open Orders'][order_id]
-                duration = timestamp - start_timestamp
-                existing_stats[exchange]['Closed Durations'].append(duration.total_seconds())
+                closed_duration = (timestamp - start_timestamp) / 1e9
+                if not self.streaming_stats:
+                    existing_stats[exchange]['Closed Durations'].append(closed_duration)
                 #Remove open orders once filled or cancelled
                 del existing_stats[exchange]['Open Orders'][order_id]
 
-        durations = existing_stats[exchange]['Closed Durations']
-        if durations:
+        if self.streaming_stats:
+            #Only a closed order changes the stats, O(1) per row whatever the number of closed orders
+            if closed_duration is not None:
+                duration_stats = existing_stats[exchange].setdefault('Duration Stats', DurationStats(self.decay))
+                duration_stats.update(closed_duration)
+                existing_stats[exchange]['Average Duration'] = pd.to_timedelta(duration_stats.mean, unit='s')
+                existing_stats[exchange]['Duration StdDev'] = pd.to_timedelta(duration_stats.std(), unit='s')
+        elif closed_duration is not None:
+            durations = existing_stats[exchange]['Closed Durations']
             average_duration = np.mean(durations)
             stddev_duration = np.std(durations, ddof=1)
             existing_stats[exchange]['Average Duration'] = pd.to_timedelta(average_duration, unit='s')
             existing_stats[exchange]['Duration StdDev'] = pd.to_timedelta(stddev_duration, unit='s')
 
-        #Check each open order to see if it exceeds 10 stdev of the average duration
+        threshold_seconds = self.stddev_multiplier * existing_stats[exchange]['Duration StdDev'].total_seconds() + existing_stats[exchange]['Average Duration'].total_seconds()
+        if timestamp <= warmup_end_ns:
+            return []
+        if self.indexed_open_orders:
+            return self._flag_oldest_open_orders(existing_stats[exchange], timestamp, threshold_seconds)
+        #Check each open order to see if it exceeds stddev_multiplier stdev of the average duration
+        flagged = []
         for open_order_id, open_timestamp in existing_stats[exchange]['Open Orders'].items():
-            open_duration = timestamp - open_timestamp
-            open_duration_seconds = open_duration.total_seconds()
-           
-            threshold_seconds = 1 * existing_stats[exchange]['Duration StdDev'].total_seconds() + existing_stats[exchange]['Average Duration'].total_seconds()
-            if open_duration_seconds > threshold_seconds and open_order_id not in existing_stats[exchange]['Flagged Trades'] and new_row['TimeStamp'] > firsttimestamp+pd.Timedelta(1,unit='m'):
+            open_duration_seconds = (timestamp - open_timestamp) / 1e9
+            if open_duration_seconds > threshold_seconds and open_order_id not in existing_stats[exchange]['Flagged Trades']:
                 existing_stats[exchange]['Flagged Trades'].add(open_order_id)  #Add to set
-        return existing_stats
-    def novelSymbol(self,existing_SymbolCount,new_row,firsttimestamp):
+                flagged.append(open_order_id)
+        return flagged
+
+    def _flag_oldest_open_orders(self, stats, timestamp, threshold_seconds):
         '''
-        Function to check if the symbol has never been traded before
-        Novelty data check
-        
+        Flag the open orders of one exchange that have been open for more than threshold_seconds
+
+        Open orders are kept in a heap ordered by open timestamp ('Open Order Index'). The oldest order is the one
+        with the longest open duration, so we only pop from the top until an order is below the threshold.
+        Flagged orders leave the heap for good and closed orders are dropped lazily when they reach the top,
+        which makes each row O(log n) amortized instead of a scan of every open order.
+
         Args:
-            existing_SymbolCount: Dictionary containing the symbol count
-            new_row: new row of the dataset
+            stats: stats dictionary of a single exchange
+            timestamp: timestamp of the current row in nanoseconds
+            threshold_seconds: open duration above which an order is flagged
         Returns:
-            existing_SymbolCount: Updated dictionary containing the symbol count
+            list of the OrderIDs flagged
         '''
-        
-        exchange = new_row['Exchange']
-        new_row['TimeStamp']=pd.to_datetime(new_row['TimeStamp'])
-        instance=False
-        if new_row['Symbol'] not in existing_SymbolCount[exchange]:
-            #Initialize the symbol
-            existing_SymbolCount[exchange][new_row['Symbol']]={}
-            existing_SymbolCount[exchange][new_row['Symbol']]['HighestTimeDiff']=0
-            existing_SymbolCount[exchange][new_row['Symbol']]['Count']=1
-            existing_SymbolCount[exchange][new_row['Symbol']]['LastTradeTime']=new_row['TimeStampEpoch']
+        open_orders = stats['Open Orders']
+        index = stats.get('Open Order Index')
+        #Build the index from the open orders the first time, or compact it once closed orders pile up
+        if index is None or len(index) > 2 * len(open_orders) + 1024:
+            index = [(open_timestamp, open_order_id) for open_order_id, open_timestamp in open_orders.items()
+                     if open_order_id not in stats['Flagged Trades']]
+            heapq.heapify(index)
+            stats['Open Order Index'] = index
 
-            existing_SymbolCount[exchange][new_row['Symbol']]['Threshold']=False
-        
-        elif new_row['MessageType']=='NewOrderRequest':
-            time_diff = (new_row['TimeStampEpoch'] - existing_SymbolCount[exchange][new_row['Symbol']]['LastTradeTime'])
-            existing_SymbolCount[exchange][new_row['Symbol']]['LastTradeTime']=new_row['TimeStampEpoch']
+        flagged = []
+        while index:
+            open_timestamp, open_order_id = index[0]
+            if open_orders.get(open_order_id) != open_timestamp or open_order_id in stats['Flagged Trades']:
+                #Closed (or re-sent) since it was indexed, or already flagged when sent before
+                heapq.heappop(index)
+                continue
+            if not (timestamp - open_timestamp) / 1e9 > threshold_seconds:
+                break
+            heapq.heappop(index)
+            stats['Flagged Trades'].add(open_order_id)  #Add to set
+            flagged.append(open_order_id)
+        return flagged
 
-            existing_SymbolCount[exchange][new_row['Symbol']]['Count']+=1
-            if time_diff>existing_SymbolCount[exchange][new_row['Symbol']]['HighestTimeDiff']:
-                existing_SymbolCount[exchange][new_row['Symbol']]['HighestTimeDiff']=time_diff
-                if existing_SymbolCount[exchange][new_row['Symbol']]['Count']>20:
-                    existing_SymbolCount[exchange][new_row['Symbol']]['Threshold']=True
-                    instance=True
+    def novelSymbol(self,existing_SymbolCount,new_row,firsttimestamp):
+        '''
+        Function to check if the symbol has never been traded before
+        Novelty data check
 
-        if new_row['TimeStamp'] > firsttimestamp+pd.Timedelta(1,unit='m') and instance and existing_SymbolCount[exchange][new_row['Symbol']]['Threshold'] and new_row['MessageType']=='NewOrderRequest':
+        The statistics of every (exchange, symbol) and the flagged symbols are kept apart in a NoveltyTracker,
+        so no symbol name can collide with them.
 
-            existing_SymbolCount[exchange]['Novelty'].add(new_row['Symbol'])
-        
-        
+        Args:
+            existing_SymbolCount: NoveltyTracker holding the symbol counts (a new one if None)
+            new_row: new row of the dataset (Event, or a row of the DataFrame)
+        Returns:
+            existing_SymbolCount: Updated NoveltyTracker, novel_symbols(exchange) is the Novelty set of an exchange
+        '''
+        event = new_row if isinstance(new_row, Event) else Event.from_row(new_row)
+        if existing_SymbolCount is None:
+            existing_SymbolCount = NoveltyTracker()
+        existing_SymbolCount.update(event, self._warmup_end_ns(firsttimestamp))
         return existing_SymbolCount
+
     def price_frequency(self,frequency_stats,new_row,granularity):
         '''
         Function to check the frequency of orders based on order type
         Args:
             frequency_stats: Dictionary containing the frequency stats
-            new_row: new row of the dataset
+            new_row: new row of the dataset (Event, or a row of the DataFrame)
             order_type: Type of order (NewOrderRequest,NewOrderAcknowledge,Trade,CancelRequest,CancelAcknowledged,Cancelled)
             granularity: Time interval to check frequency
         Returns:
             frequency_stats: Updated dictionary containing the frequency stats
         '''
-        
-       
-        exchange = new_row['Exchange']
-        new_row_time = pd.to_datetime(new_row['TimeStamp'])
-        message_type = new_row['MessageType']
-
-        interval_start = pd.to_datetime('2024-01-05 09:28:000000')
-        interval_end = pd.to_datetime('2024-01-05 09:32:00.000000')
+        event = new_row if isinstance(new_row, Event) else Event.from_row(new_row)
+        exchange = event.exchange
+        message_type = event.message_type
 
         if exchange not in frequency_stats:
             frequency_stats[exchange] = {'frequency': {}}
 
-        if interval_start <= new_row_time <= interval_end:
-            time_key = new_row_time.floor(granularity)
+        if self.FREQUENCY_INTERVAL_START.value <= event.timestamp <= self.FREQUENCY_INTERVAL_END.value:
+            if granularity not in self._granularity_ns:
+                self._granularity_ns[granularity] = pd.Timedelta(granularity).value
+            time_key = pd.Timestamp(event.timestamp - event.timestamp % self._granularity_ns[granularity])
             if time_key not in frequency_stats[exchange]['frequency']:
-                frequency_stats[exchange]['frequency'][time_key] = {'OrderCounts': {'NewOrderRequest':0, 'NewOrderAcknowledged':0, 'Cancelled':0, 'CancelRequest':0,
-    'Trade':0, 'Rejected':0}}
+                frequency_stats[exchange]['frequency'][time_key] = {'OrderCounts': dict.fromkeys(self.FREQUENCY_MESSAGE_TYPES, 0)}
 
             if message_type not in frequency_stats[exchange]['frequency'][time_key]['OrderCounts']:
                 frequency_stats[exchange]['frequency'][time_key]['OrderCounts'][message_type] = 0
@@ -172,6 +582,261 @@ class Exchange:
 
         return frequency_stats
 
+    def _check_batch_stats(self):
+        '''
+        The batch detectors compute the exact running duration stats, they cannot give the flags of decayed stats
+        '''
+        if self.decay is not None:
+            raise ValueError("detect_all does not support decayed duration stats (decay), use update_exchanges "
+                             "or StaleOrderRule of detector_pipeline row by row instead.")
+
+    def detect_all(self, df=None, firsttimestamp=None, granularity='1s'):
+        '''
+        Vectorized version of update_exchanges, novelSymbol and price_frequency over a whole dataset
+
+        Gives the same flags as feeding every row in order to the three functions and checking the
+        Flagged Trades and Novelty sets after each row, using grouped NumPy/pandas operations instead
+        of a Python loop. Rows must be in timestamp order within each exchange. The duration stats are
+        the exact running ones (streaming_stats gives the same), decayed stats (decay) raise ValueError.
+
+        Args:
+            df: dataset to run the detectors on (the dataset given at init by default)
+            firsttimestamp: start of the session for the warmup (first TimeStamp of df by default)
+            granularity: time interval of the frequency buckets
+        Returns:
+            DataFrame with the same index as df and the columns:
+            StaleOrder: the OrderID has been flagged by update_exchanges at this row
+            NovelSymbol: the Symbol has been flagged by novelSymbol at this row
+            FrequencyBucket: time key of the row in price_frequency (NaT outside of the interval)
+            RowFlagged: 1 if StaleOrder or NovelSymbol, else 0
+        '''
+        self._check_batch_stats()
+        if df is None:
+            df = self.dataset
+        timestamps = pd.to_datetime(df['TimeStamp'])
+        if firsttimestamp is None:
+            firsttimestamp = timestamps.iloc[0]
+        timestamp_ns = timestamps.to_numpy(dtype='datetime64[ns]').view('int64')
+        warmup_end_ns = (pd.Timestamp(firsttimestamp) + self.warmup).value
+
+        exchange_codes, _ = pd.factorize(df['Exchange'])
+        order_codes, _ = pd.factorize(df['OrderID'])
+        symbol_codes, _ = pd.factorize(df['Symbol'])
+        is_open = (df['MessageType'] == 'NewOrderRequest').to_numpy()
+        is_close = df['MessageType'].isin(['Cancelled', 'Rejected']).to_numpy()
+        position = np.arange(len(df))
+
+        order_flagged_at = self._stale_order_positions(exchange_codes, order_codes, is_open, is_close,
+                                                       timestamp_ns, warmup_end_ns)
+        symbol_flagged_at = self._novel_symbol_positions(exchange_codes, symbol_codes, is_open,
+                                                         self._epoch_values(df['TimeStampEpoch']), timestamp_ns, warmup_end_ns)
+
+        flags = pd.DataFrame(index=df.index)
+        flags['StaleOrder'] = position >= order_flagged_at[order_codes]
+        flags['NovelSymbol'] = position >= symbol_flagged_at[symbol_codes]
+        flags['FrequencyBucket'] = self._frequency_buckets(timestamps, granularity)
+        flags['RowFlagged'] = (flags['StaleOrder'] | flags['NovelSymbol']).astype(int)
+        return flags
+
+    def detect_all_parallel(self, df=None, firsttimestamp=None, granularity='1s', max_workers=None):
+        '''
+        detect_all and price_frequency_table with the dataset sharded by exchange over a process pool
+
+        update_exchanges keeps its state per exchange and novelSymbol per (exchange, symbol), so every
+        exchange is detected independently in its own process. The shards send back the first row each
+        OrderID and Symbol is flagged at, and their frequency table, which are merged into the same
+        result as detect_all on the whole dataset (a symbol is novel from its first flag on any exchange).
+        The shards get the settings of this Exchange, decayed stats (decay) raise ValueError like detect_all.
+
+        Args:
+            df: dataset to run the detectors on (the dataset given at init by default)
+            firsttimestamp: start of the session for the warmup (first TimeStamp of df by default)
+            granularity: time interval of the frequency buckets
+            max_workers: number of processes (one per exchange at most), 1 runs the shards in this process
+        Returns:
+            flags: same DataFrame as detect_all
+            frequency_stats: same DataFrame as price_frequency_table
+        '''
+        self._check_batch_stats()
+        if df is None:
+            df = self.dataset
+        timestamps = pd.to_datetime(df['TimeStamp'])
+        if firsttimestamp is None:
+            firsttimestamp = timestamps.iloc[0]
+
+        exchange_codes, exchanges = pd.factorize(df['Exchange'])
+        shard_positions = [np.flatnonzero(exchange_codes == code) for code in range(len(exchanges))]
+        settings = {'stddev_multiplier': self.stddev_multiplier, 'warmup': self.warmup,
+                    'streaming_stats': self.streaming_stats, 'decay': self.decay}
+        #Shards get the parsed timestamps so they are not parsed again in every process
+        parsed = df.assign(TimeStamp=timestamps)
+        tasks = [(settings, parsed.iloc[positions], positions, firsttimestamp, granularity) for positions in shard_positions]
+
+        if max_workers is None:
+            max_workers = min(len(tasks), os.cpu_count() or 1)
+        if max_workers <= 1 or len(tasks) <= 1:
+            results = [_detect_shard(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(_detect_shard, tasks))
+
+        #First flagged row of every OrderID and Symbol over all the shards
+        position = np.arange(len(df))
+        flags = pd.DataFrame(index=df.index)
+        for column, key in (('StaleOrder', 'OrderID'), ('NovelSymbol', 'Symbol')):
+            flagged_at = pd.concat([result[column] for result in results]).sort_values(kind='stable') if results else pd.Series(dtype='int64')
+            flagged_at = flagged_at[~flagged_at.index.duplicated()]
+            first_flag = df[key].map(flagged_at).fillna(len(df)).to_numpy()
+            flags[column] = position >= first_flag
+        flags['FrequencyBucket'] = self._frequency_buckets(timestamps, granularity)
+        flags['RowFlagged'] = (flags['StaleOrder'] | flags['NovelSymbol']).astype(int)
+
+        if results:
+            frequency_stats = pd.concat([result['frequency_stats'] for result in results]).fillna(0).astype('int64').sort_index()
+            extra_types = [message_type for message_type in frequency_stats.columns if message_type not in self.FREQUENCY_MESSAGE_TYPES]
+            frequency_stats = frequency_stats.reindex(columns=self.FREQUENCY_MESSAGE_TYPES + extra_types, fill_value=0)
+        else:
+            frequency_stats = self.price_frequency_table(df, granularity)
+        return flags, frequency_stats
+
+    def price_frequency_table(self, df=None, granularity='1s'):
+        '''
+        Vectorized version of price_frequency over a whole dataset
+
+        Args:
+            df: dataset to count (the dataset given at init by default)
+            granularity: time interval to check frequency
+        Returns:
+            DataFrame indexed by (Exchange, time key) with one column of counts per message type
+        '''
+        if df is None:
+            df = self.dataset
+        buckets = self._frequency_buckets(pd.to_datetime(df['TimeStamp']), granularity)
+        counts = df.groupby([df['Exchange'], buckets.rename('TimeKey'), df['MessageType']], observed=True).size().unstack(fill_value=0)
+        extra_types = [message_type for message_type in counts.columns if message_type not in self.FREQUENCY_MESSAGE_TYPES]
+        return counts.reindex(columns=self.FREQUENCY_MESSAGE_TYPES + extra_types, fill_value=0)
+
+    def _frequency_buckets(self, timestamps, granularity):
+        '''
+        Time key of every row for price_frequency, NaT outside of the frequency interval
+        '''
+        in_interval = (timestamps >= self.FREQUENCY_INTERVAL_START) & (timestamps <= self.FREQUENCY_INTERVAL_END)
+        return timestamps.dt.floor(granularity).where(in_interval)
+
+    @staticmethod
+    def _epoch_values(epochs):
+        '''
+        TimeStampEpoch as int64 whether it was loaded as numbers or parsed as datetimes
+        '''
+        if pd.api.types.is_datetime64_any_dtype(epochs):
+            return epochs.to_numpy(dtype='datetime64[ns]').view('int64')
+        return pd.to_numeric(epochs).to_numpy(dtype='int64')
+
+    def _stale_order_positions(self, exchange_codes, order_codes, is_open, is_close, timestamp_ns, warmup_end_ns):
+        '''
+        Batch version of the open order check of update_exchanges
+
+        For every exchange, the threshold after each row only depends on the orders closed so far, so
+        now - threshold is known for every row. An order opened at t is flagged at the first later row where
+        now - threshold > t, which is a searchsorted on the running max of now - threshold (rows before
+        the order was opened can never cross it). The order is flagged if that row comes before it is closed.
+
+        Returns:
+            array with, for every OrderID code, the first position where it is in Flagged Trades
+            (len(timestamp_ns) if never)
+        '''
+        n_rows = len(timestamp_ns)
+        if not n_rows:
+            return np.zeros(0, dtype=np.int64)
+        flagged_at = np.full(order_codes.max() + 1, n_rows)
+
+        #Open and close messages of each (exchange, order) in row order
+        events = np.flatnonzero(is_open | is_close)
+        key = exchange_codes[events].astype(np.int64) * (order_codes.max() + 1) + order_codes[events]
+        sort = np.lexsort((events, key))
+        events, key = events[sort], key[sort]
+        same_as_previous = np.r_[False, key[1:] == key[:-1]]
+        same_as_next = np.r_[key[1:] == key[:-1], False]
+        previous_event = np.r_[0, events[:-1]]
+        next_event = np.r_[events[1:], n_rows]
+
+        #A close only counts if the message before it for the same order opened it (it was in Open Orders)
+        valid_close = is_close[events] & same_as_previous & is_open[previous_event]
+        close_positions = events[valid_close]
+        close_durations = (timestamp_ns[close_positions] - timestamp_ns[previous_event[valid_close]]) / 1e9
+        sort = np.argsort(close_positions, kind='stable')
+        close_positions, close_durations = close_positions[sort], close_durations[sort]
+
+        #An open order stays in Open Orders until the next message that closes or re-opens it
+        opens = is_open[events]
+        open_positions = events[opens]
+        open_ends = np.where(same_as_next[opens], next_event[opens], n_rows)
+
+        base_ns = timestamp_ns.min()
+        for code in range(exchange_codes.max() + 1):
+            rows = np.flatnonzero(exchange_codes == code)
+            now = timestamp_ns[rows] - base_ns
+            if np.any(np.diff(now) < 0):
+                raise ValueError("detect_all needs the rows of each exchange in timestamp order.")
+
+            #Running mean and stddev (ddof=1) after each close, shifted by the first duration for stability
+            in_exchange = exchange_codes[close_positions] == code
+            closes, durations = close_positions[in_exchange], close_durations[in_exchange]
+            threshold = np.zeros(len(durations))
+            if len(durations):
+                count = np.arange(1, len(durations) + 1)
+                shifted = durations - durations[0]
+                sum_shifted = np.cumsum(shifted)
+                with np.errstate(invalid='ignore', divide='ignore'):
+                    variance = (np.cumsum(shifted * shifted) - sum_shifted * sum_shifted / count) / (count - 1)
+                average = durations[0] + sum_shifted / count
+                threshold = self.stddev_multiplier * np.sqrt(np.maximum(variance, 0)) + average
+                threshold[count < 2] = np.nan
+
+            #Threshold in place at each row: 0 before the first close, nan with a single close
+            last_close = np.searchsorted(closes, rows, side='right') - 1
+            row_threshold = np.where(last_close >= 0, threshold[np.maximum(last_close, 0)], 0.0) if len(closes) else np.zeros(len(rows))
+            reach = now - row_threshold * 1e9
+            reach[np.isnan(reach) | (timestamp_ns[rows] <= warmup_end_ns)] = -np.inf
+            reach = np.maximum.accumulate(reach)
+
+            in_exchange = exchange_codes[open_positions] == code
+            opened_at = timestamp_ns[open_positions[in_exchange]] - base_ns
+            crossing = np.searchsorted(reach, opened_at, side='right')
+            crossing_positions = np.append(rows, n_rows)[crossing]
+            flagged = crossing_positions < open_ends[in_exchange]
+            np.minimum.at(flagged_at, order_codes[open_positions[in_exchange][flagged]], crossing_positions[flagged])
+        return flagged_at
+
+    def _novel_symbol_positions(self, exchange_codes, symbol_codes, is_open, epochs, timestamp_ns, warmup_end_ns):
+        '''
+        Batch version of novelSymbol (see NoveltyTracker.first_novel_positions)
+        '''
+        return NoveltyTracker.first_novel_positions(exchange_codes, symbol_codes, is_open, epochs, timestamp_ns, warmup_end_ns)
+
+
+
+def _detect_shard(task):
+    '''
+    Run detect_all and price_frequency_table on one exchange of the dataset (worker of detect_all_parallel)
+
+    Args:
+        task: (Exchange settings, rows of the exchange, their positions in the dataset, firsttimestamp, granularity)
+    Returns:
+        dict with the first flagged position of every flagged OrderID (StaleOrder) and Symbol (NovelSymbol),
+        and the frequency table of the exchange
+    '''
+    settings, shard, positions, firsttimestamp, granularity = task
+    exchange = Exchange(shard, **settings)
+    flags = exchange.detect_all(shard, firsttimestamp=firsttimestamp, granularity=granularity)
+    result = {'frequency_stats': exchange.price_frequency_table(shard, granularity)}
+    for column, key in (('StaleOrder', 'OrderID'), ('NovelSymbol', 'Symbol')):
+        flagged = flags[column].to_numpy()
+        keys = shard[key].to_numpy()[flagged]
+        #Positions are increasing, the first occurrence of a key is its first flag
+        first = ~pd.Series(keys).duplicated().to_numpy()
+        result[column] = pd.Series(positions[flagged][first], index=keys[first])
+    return result
 
 
 if __name__ == '__main__':
@@ -183,89 +848,9 @@ if __name__ == '__main__':
     
     exchangeOrders=pd.read_csv('/Users/jean-christophegaudreau/Desktop/Coding/Python/ConUHackss/output.csv')
     startExchange=Exchange(exchangeOrders)
-    #Initialize main dictionaries for every stats that we want to output
-    
-    
-    exchange_stats = {
-        'Exchange_1': {
-                'Order Sent': 0,
-                'Trade Passed': 0,
-                'Order Cancelled': 0,
-                'Open Orders': {},
-                'Closed Durations': [],
-                'Average Duration': pd.Timedelta(0),
-                'Duration StdDev': pd.Timedelta(0),
-                'Flagged Trades': set()  #Using a set to prevent duplicates and faster lookup
-            },
-        'Exchange_2': {
-                'Order Sent': 0,
-                'Trade Passed': 0,
-                'Order Cancelled': 0,
-                'Open Orders': {},
-                'Closed Durations': [],
-                'Average Duration': pd.Timedelta(0),
-                'Duration StdDev': pd.Timedelta(0),
-                'Flagged Trades': set()  #Using a set to prevent duplicates and faster lookup
-            },
-        'Exchange_3': {
-                'Order Sent': 0,
-                'Trade Passed': 0,
-                'Order Cancelled': 0,
-                'Open Orders': {},
-                'Closed Durations': [],
-                'Average Duration': pd.Timedelta(0),
-                'Duration StdDev': pd.Timedelta(0),
-                'Flagged Trades': set()  #Using a set to prevent duplicates and faster lookup
-            }
-    }
-    #Structure for novelty stats (adding a new key for symbol in the function)
-    existing_SymbolCount={
-        'Exchange_1': {
-                'Novelty': set(),
-        },
-        'Exchange_2': {
-                'Novelty': set(),
-               
-        },
-        'Exchange_3': {
-                'Novelty': set(),
-                
-                
-        }
-    }
-    
-    #Structure for frequency stats (adding a new key for each timestamp as well as each order type in the function)
-    frequency_stats={
-        'Exchange_1': {
-            'frequency':{}
-        },
-        'Exchange_2': {
-            'frequency':{}
-
-        },
-        'Exchange_3': {
-            'frequency':{}
-        }
-    }
-
-    for index, row in exchangeOrders.iterrows():
-        row_flagged = 0
-        exchange_stats=startExchange.update_exchanges(exchange_stats,row,pd.to_datetime(exchangeOrders['TimeStamp'][0]))
-        existing_SymbolCount=startExchange.novelSymbol(existing_SymbolCount,row,pd.to_datetime(exchangeOrders['TimeStamp'][0])) 
-        frequency_stats=startExchange.price_frequency(frequency_stats,row,'1s')
-        order_id = row['OrderID']
-        print(exchange_stats)
-        for exchange in exchange_stats:
-            if order_id in exchange_stats[exchange]['Flagged Trades']:
-                row_flagged = 1
-                break  # No need to check further if already flagged
-
-        # Check if the current row's Symbol is flagged in any exchange
-        
-        if not row_flagged:  # Only check if not already flagged by OrderID
-            symbol = row['Symbol']
-            for exchange in existing_SymbolCount:
-                if symbol in existing_SymbolCount[exchange]['Novelty']:
-                    row_flagged = 1
-                    break  # No need to check further if already flagged
 
+    #Run the stale order, novelty and frequency detectors over the whole dataset at once instead of row by row
+    flags=startExchange.detect_all(exchangeOrders, granularity='1s')
+    exchangeOrders['RowFlagged']=flags['RowFlagged']
+    frequency_stats=startExchange.price_frequency_table(exchangeOrders, granularity='1s')
+    print(f"{exchangeOrders['RowFlagged'].sum()} rows flagged")
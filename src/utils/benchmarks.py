@@ -0,0 +1,230 @@
+import os
+import time
+import tempfile
+import numpy as np
+import pandas as pd
+
+from utils.FishFish import Exchange
+from utils.file_manager import FileManagerDynamic
+
+
+def make_synthetic_feed(n_messages: int = 1_000_000, n_exchanges: int = 3, open_share: float = 0.1,
+                        random_state: int = 42) -> pd.DataFrame:
+    """
+    Build a synthetic exchange feed with the same columns as exchange_concat.csv.
+
+    Every order sends a NewOrderRequest and a NewOrderAcknowledged, most of them are then Cancelled a few
+    milliseconds later and open_share of them stay open until the end of the feed, so the number of open
+    orders keeps growing like on a busy session.
+
+    Parameters:
+    -----------
+    n_messages : int
+        Number of messages in the feed.
+    n_exchanges : int
+        Number of exchanges the orders are spread over.
+    open_share : float
+        Share of orders that are never closed.
+    random_state : int
+        Seed of the random generator.
+
+    Returns:
+    --------
+    pd.DataFrame
+        The feed sorted by TimeStamp.
+    """
+    rng = np.random.default_rng(random_state)
+    n_orders = int(n_messages / (3 - open_share)) + 1
+    session_start = pd.Timestamp('2024-01-05 09:28:00').value
+    session_ns = 4 * 60 * 10**9
+
+    open_time = session_start + np.sort(rng.integers(0, session_ns, n_orders))
+    ack_time = open_time + rng.integers(10_000, 100_000, n_orders)
+    close_time = ack_time + rng.exponential(5e6, n_orders).astype(np.int64)
+    closed = rng.random(n_orders) >= open_share
+
+    order_ids = np.array([f'order_{i}' for i in range(n_orders)], dtype=object)
+    exchanges = np.array([f'Exchange_{i + 1}' for i in range(n_exchanges)], dtype=object)[rng.integers(0, n_exchanges, n_orders)]
+
+    feed = pd.DataFrame({
+        'TimeStampEpoch': np.concatenate([open_time, ack_time, close_time[closed]]),
+        'OrderID': np.concatenate([order_ids, order_ids, order_ids[closed]]),
+        'MessageType': ['NewOrderRequest'] * n_orders + ['NewOrderAcknowledged'] * n_orders + ['Cancelled'] * int(closed.sum()),
+        'Exchange': np.concatenate([exchanges, exchanges, exchanges[closed]]),
+    })
+    feed = feed.sort_values('TimeStampEpoch', kind='stable').head(n_messages).reset_index(drop=True)
+    feed.insert(0, 'TimeStamp', pd.to_datetime(feed['TimeStampEpoch']))
+    feed['Direction'] = np.where(feed['MessageType'] == 'NewOrderAcknowledged', 'ExchangeToNBF', 'NBFToExchange')
+    feed['Symbol'] = 'SYNTH'
+    feed['OrderPrice'] = 100.0
+    return feed
+
+
+def _time_update_exchanges(feed: pd.DataFrame, indexed_open_orders: bool, n_messages: int) -> tuple:
+    exchange = Exchange(feed, streaming_stats=True, indexed_open_orders=indexed_open_orders)
+    #Start the feed past the one minute warm-up so every row checks the open orders
+    first_timestamp = feed['TimeStamp'].iloc[0] - pd.Timedelta(1, unit='m')
+    events = list(exchange.events(feed.iloc[:n_messages]))
+
+    existing_stats = {}
+    start = time.perf_counter()
+    for event in events:
+        existing_stats = exchange.update_exchanges(existing_stats, event, first_timestamp)
+    elapsed = time.perf_counter() - start
+
+    flagged = set().union(*(stats['Flagged Trades'] for stats in existing_stats.values()))
+    return elapsed, flagged
+
+
+def benchmark_open_order_index(n_messages: int = 1_000_000, max_scan_messages: int = 50_000) -> pd.DataFrame:
+    """
+    Compare the heap-indexed open orders of Exchange.update_exchanges against the full scan.
+
+    The full scan is quadratic, so it is only timed on the first max_scan_messages messages. The indexed
+    version is timed on the same prefix (to check both flag the same orders) and on the whole feed.
+
+    Parameters:
+    -----------
+    n_messages : int
+        Size of the synthetic feed.
+    max_scan_messages : int
+        Number of messages the full scan is timed on.
+
+    Returns:
+    --------
+    pd.DataFrame
+        Time and throughput of each run.
+    """
+    feed = make_synthetic_feed(n_messages)
+    prefix = min(max_scan_messages, n_messages)
+
+    scan_time, scan_flagged = _time_update_exchanges(feed, indexed_open_orders=False, n_messages=prefix)
+    index_time, index_flagged = _time_update_exchanges(feed, indexed_open_orders=True, n_messages=prefix)
+    if scan_flagged != index_flagged:
+        raise AssertionError("Indexed open orders and full scan flagged different orders.")
+    full_time, _ = _time_update_exchanges(feed, indexed_open_orders=True, n_messages=n_messages)
+
+    results = pd.DataFrame({
+        'Method': ['full scan', 'open order index', 'open order index'],
+        'Messages': [prefix, prefix, n_messages],
+        'Seconds': [scan_time, index_time, full_time],
+    })
+    results['Messages/s'] = results['Messages'] / results['Seconds']
+    return results
+
+
+def make_synthetic_tree(root: str, n_packages: int = 2000, n_objects: int = 256) -> str:
+    """
+    Build a project tree like ours under root: a big virtualenv and .git next to data/ and src/utils/.
+
+    Returns:
+    --------
+    str
+        The src/utils folder to start the searches from.
+    """
+    project = os.path.join(root, 'project')
+    for i in range(n_packages):
+        os.makedirs(os.path.join(project, '.venv', 'lib', 'site-packages', f'package_{i}', 'submodule'), exist_ok=True)
+    for i in range(n_objects):
+        os.makedirs(os.path.join(project, '.git', 'objects', f'{i:02x}'), exist_ok=True)
+    os.makedirs(os.path.join(project, 'data', 'taq_data'), exist_ok=True)
+    start_path = os.path.join(project, 'src', 'utils')
+    os.makedirs(start_path, exist_ok=True)
+    return start_path
+
+
+def _recursive_search(ceiling_directory: str, target_name: str, start_path: str, search_type: str = 'both'):
+    """
+    The recursive DFS FileManagerDynamic.search used before the BFS, kept as the baseline of benchmark_search.
+    """
+    visited = set()
+
+    def dfs_search(current_path):
+        if current_path in visited or (ceiling_directory and current_path.endswith(ceiling_directory)):
+            return None
+        visited.add(current_path)
+        all_names = os.listdir(current_path)
+        if target_name in all_names:
+            full_path = os.path.join(current_path, target_name)
+            if (search_type == 'both' or
+                    (search_type == 'file' and os.path.isfile(full_path)) or
+                    (search_type == 'folder' and os.path.isdir(full_path))):
+                return full_path
+        for name in all_names:
+            new_path = os.path.join(current_path, name)
+            if os.path.isdir(new_path):
+                result = dfs_search(new_path)
+                if result:
+                    return result
+        parent_path = os.path.dirname(current_path)
+        if parent_path and parent_path != current_path:
+            return dfs_search(parent_path)
+        return None
+
+    return dfs_search(start_path)
+
+
+def _time_per_call(function, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def benchmark_search(targets: tuple = ('data', 'taq_data', 'missing'), repeat: int = 20) -> pd.DataFrame:
+    """
+    Time folder searches from src/utils on a synthetic project tree.
+
+    Each target is searched with the old recursive DFS, the BFS with the default ignore patterns, the BFS
+    without ignore patterns and FileManagerDynamic.search with its cache (misses are not cached, so a
+    missing target walks the tree every time).
+
+    Parameters:
+    -----------
+    targets : tuple
+        Folder names to search for from src/utils, 'missing' is not in the tree.
+    repeat : int
+        Number of searches timed per target and method.
+
+    Returns:
+    --------
+    pd.DataFrame
+        Average time per search in milliseconds.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as root:
+        start_path = make_synthetic_tree(root)
+        fm = FileManagerDynamic(ceiling_directory=root)
+        fm_no_ignore = FileManagerDynamic(ceiling_directory=root, ignore_patterns=())
+        for target in targets:
+            fm.search(target, start_path, 'folder')
+            results.append({
+                'Target': target,
+                'Recursive DFS (ms)': _time_per_call(lambda: _recursive_search(root, target, start_path, 'folder'), repeat),
+                'BFS (ms)': _time_per_call(lambda: fm._search_tree(target, start_path, 'folder'), repeat),
+                'BFS, no ignore patterns (ms)': _time_per_call(lambda: fm_no_ignore._search_tree(target, start_path, 'folder'), repeat),
+                'Cached (ms)': _time_per_call(lambda: fm.search(target, start_path, 'folder'), repeat),
+            })
+    return pd.DataFrame(results)
+
+
+BENCHMARKS = {
+    'open_orders': benchmark_open_order_index,
+    'search': benchmark_search,
+}
+
+
+if __name__ == '__main__':
+    import argparse
+
+    print('This is benchmarks.py')
+
+    parser = argparse.ArgumentParser(description='Run the benchmarks of utils.')
+    parser.add_argument('benchmarks', nargs='*', metavar='benchmark',
+                        help=f"benchmarks to run among {', '.join(sorted(BENCHMARKS))} (all of them by default)")
+    names = parser.parse_args().benchmarks or sorted(BENCHMARKS)
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    for name in names:
+        print(BENCHMARKS[name]().to_string(index=False))
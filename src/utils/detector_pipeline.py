@@ -0,0 +1,276 @@
+from abc import ABC, abstractmethod
+import itertools
+import pandas as pd
+
+from utils.FishFish import Exchange, NoveltyTracker, _timestamp_ns
+
+
+class Flag:
+    '''
+    One flag emitted by a rule of DetectorPipeline
+
+    rule: name of the rule that raised it ('StaleOrder', 'NovelSymbol', 'FrequencyBurst')
+    key: what is flagged, the OrderID, the Symbol or the start of the bucket (pd.Timestamp) of a burst
+    exchange: exchange where it was flagged
+    timestamp: time of the event that raised the flag in nanoseconds
+    '''
+    __slots__ = ('rule', 'key', 'exchange', 'timestamp')
+
+    def __init__(self, rule, key, exchange, timestamp):
+        self.rule = rule
+        self.key = key
+        self.exchange = exchange
+        self.timestamp = timestamp
+
+    def __repr__(self):
+        return f"Flag({', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)})"
+
+
+class DetectorRule(ABC):
+    '''
+    Base class of the rules driven by DetectorPipeline
+
+    A rule keeps its own compact state, updated by on_event for every event in timestamp order, and returns
+    the flags the event raises.
+    '''
+    name = None
+
+    def start(self, firsttimestamp):
+        '''
+        Called once before the first event with the start of the session
+        '''
+
+    @abstractmethod
+    def on_event(self, event):
+        '''
+        Update the state with one Event
+
+        Returns:
+            list of the Flag raised by the event (usually empty)
+        '''
+
+
+class StaleOrderRule(DetectorRule):
+    '''
+    update_exchanges as a rule: an open order is flagged once open for longer than the average duration of
+    the closed orders of its exchange + stddev_multiplier * their stddev
+
+    The events go through the same update as update_exchanges, with streaming duration stats.
+    '''
+    name = 'StaleOrder'
+
+    def __init__(self, stddev_multiplier=1, warmup=pd.Timedelta(1, unit='m'), decay=None):
+        self.exchange = Exchange(None, streaming_stats=True, decay=decay, stddev_multiplier=stddev_multiplier, warmup=warmup)
+        self.warmup_end_ns = None
+        #Stats of every exchange, as in update_exchanges
+        self.stats = {}
+
+    def start(self, firsttimestamp):
+        self.warmup_end_ns = self.exchange._warmup_end_ns(firsttimestamp)
+
+    def on_event(self, event):
+        flagged = self.exchange._update_exchange_stats(self.stats, event, self.warmup_end_ns)
+        return [Flag(self.name, order_id, event.exchange, event.timestamp) for order_id in flagged]
+
+
+class NoveltyRule(DetectorRule):
+    '''
+    novelSymbol as a rule: a symbol is flagged the first time it is novel on an exchange (see NoveltyTracker)
+    '''
+    name = 'NovelSymbol'
+
+    def __init__(self, warmup=pd.Timedelta(1, unit='m')):
+        self.warmup = pd.Timedelta(warmup)
+        self.warmup_end_ns = None
+        self.tracker = NoveltyTracker()
+
+    def start(self, firsttimestamp):
+        self.warmup_end_ns = _timestamp_ns(firsttimestamp) + self.warmup.value
+
+    def on_event(self, event):
+        if self.tracker.update(event, self.warmup_end_ns):
+            return [Flag(self.name, event.symbol, event.exchange, event.timestamp)]
+        return []
+
+
+class FrequencyBurstRule(DetectorRule):
+    '''
+    Flags a time bucket of an exchange once it holds more than max_messages messages
+
+    Only the current bucket of every exchange is kept, events being in timestamp order.
+    '''
+    name = 'FrequencyBurst'
+
+    def __init__(self, max_messages, granularity='1s', message_types=None):
+        '''
+        max_messages: number of messages in one bucket above which the bucket is flagged
+        granularity: time interval of the buckets
+        message_types: message types counted (all of them by default)
+        '''
+        self.max_messages = max_messages
+        self.granularity_ns = pd.Timedelta(granularity).value
+        self.message_types = None if message_types is None else set(message_types)
+        #exchange -> [bucket, count]
+        self.buckets = {}
+
+    def on_event(self, event):
+        if self.message_types is not None and event.message_type not in self.message_types:
+            return []
+        bucket = event.timestamp_epoch // self.granularity_ns
+        current = self.buckets.get(event.exchange)
+        if current is None or current[0] != bucket:
+            current = self.buckets[event.exchange] = [bucket, 0]
+        current[1] += 1
+        if current[1] == self.max_messages + 1:
+            return [Flag(self.name, pd.Timestamp(bucket * self.granularity_ns), event.exchange, event.timestamp)]
+        return []
+
+
+class FlagRegistry:
+    '''
+    Flags of all the exchanges keyed by OrderID and by Symbol, with the reason and the exchange of each
+
+    Replaces probing the Flagged Trades and Novelty sets of every exchange for each row: whether a row is
+    flagged, and why, is one dict lookup on its OrderID, then one on its Symbol if the order is not flagged.
+    Only the first flag of a key is kept.
+
+    It serves the streaming path (DetectorPipeline.flag_events and flag_frame). main_fish and the FishFish.py
+    driver use Exchange.detect_all, which gives RowFlagged for the whole dataset without any per-row lookup.
+    '''
+    #Rule name -> row column its flags are keyed by (flags of other rules, like bursts, are not about a row)
+    KEY_COLUMNS = {StaleOrderRule.name: 'OrderID', NoveltyRule.name: 'Symbol'}
+
+    def __init__(self):
+        self.by_order_id = {}
+        self.by_symbol = {}
+
+    def add(self, flag):
+        '''
+        Register a Flag, returns True if it is the first flag of its key
+        '''
+        column = self.KEY_COLUMNS.get(flag.rule)
+        if column is None:
+            return False
+        flags = self.by_order_id if column == 'OrderID' else self.by_symbol
+        if flag.key in flags:
+            return False
+        flags[flag.key] = flag
+        return True
+
+    def lookup(self, order_id, symbol):
+        '''
+        Is the row flagged and why
+
+        Returns:
+            Flag of the OrderID, else Flag of the Symbol, else None
+        '''
+        flag = self.by_order_id.get(order_id)
+        if flag is None:
+            flag = self.by_symbol.get(symbol)
+        return flag
+
+    def __len__(self):
+        return len(self.by_order_id) + len(self.by_symbol)
+
+
+class DetectorPipeline:
+    '''
+    Drives a list of rules over a stream of events in a single pass and streams out their flags
+
+    Every event is given to every rule before the next one is read, so adding a rule adds no pass over
+    the data.
+    '''
+
+    def __init__(self, rules):
+        self.rules = list(rules)
+
+    @classmethod
+    def default(cls, stddev_multiplier=1, warmup=pd.Timedelta(1, unit='m'), max_messages=None, granularity='1s'):
+        '''
+        Pipeline with the stale order and novelty rules, plus the frequency burst rule if max_messages is set
+        '''
+        rules = [StaleOrderRule(stddev_multiplier, warmup), NoveltyRule(warmup)]
+        if max_messages is not None:
+            rules.append(FrequencyBurstRule(max_messages, granularity))
+        return cls(rules)
+
+    def run(self, events, firsttimestamp=None):
+        '''
+        Feed the events to the rules and yield the flags as they are raised
+
+        Args:
+            events: iterable of Event in timestamp order
+            firsttimestamp: start of the session for the warmups (time of the first event by default)
+        Returns:
+            generator of Flag
+        '''
+        events = iter(events)
+        first_event = next(events, None)
+        if first_event is None:
+            return
+        for rule in self.rules:
+            rule.start(first_event.timestamp if firsttimestamp is None else firsttimestamp)
+        events = itertools.chain([first_event], events)
+
+        for event in events:
+            for rule in self.rules:
+                yield from rule.on_event(event)
+
+    def flag_events(self, events, registry=None, firsttimestamp=None):
+        '''
+        run, checking every event against the flags raised so far, like RowFlagged in detect_all
+
+        Args:
+            events: iterable of Event in timestamp order
+            registry: FlagRegistry the flags are added to (a new one by default)
+            firsttimestamp: start of the session for the warmups (time of the first event by default)
+        Returns:
+            generator of (event, Flag of the row or None)
+        '''
+        if registry is None:
+            registry = FlagRegistry()
+        events = iter(events)
+        first_event = next(events, None)
+        if first_event is None:
+            return
+        for rule in self.rules:
+            rule.start(first_event.timestamp if firsttimestamp is None else firsttimestamp)
+
+        for event in itertools.chain([first_event], events):
+            for rule in self.rules:
+                for flag in rule.on_event(event):
+                    registry.add(flag)
+            yield event, registry.lookup(event.order_id, event.symbol)
+
+    def flag_frame(self, df, registry=None, firsttimestamp=None, chunk_size=100_000):
+        '''
+        flag_events over the rows of a DataFrame
+
+        Returns:
+            DataFrame with the same index as df and the columns:
+            RowFlagged: 1 if the OrderID or the Symbol is flagged at this row, else 0
+            FlagReason: name of the rule that flagged it (None if not flagged)
+            FlagExchange: exchange where it was flagged (None if not flagged)
+        '''
+        reasons = []
+        exchanges = []
+        for _, flag in self.flag_events(Exchange(df).events(df, chunk_size=chunk_size), registry, firsttimestamp):
+            if flag is None:
+                reasons.append(None)
+                exchanges.append(None)
+            else:
+                reasons.append(flag.rule)
+                exchanges.append(flag.exchange)
+        flags = pd.DataFrame({'FlagReason': reasons, 'FlagExchange': exchanges}, index=df.index, dtype=object)
+        flags.insert(0, 'RowFlagged', flags['FlagReason'].notna().astype(int))
+        return flags
+
+    def run_frame(self, df, firsttimestamp=None, chunk_size=100_000):
+        '''
+        run over the rows of a DataFrame, converted to Events a chunk at a time (see Exchange.events)
+        '''
+        return self.run(Exchange(df).events(df, chunk_size=chunk_size), firsttimestamp=firsttimestamp)
+
+
+if __name__ == '__main__':
+    print('This is detector_pipeline.py')
@@ -2,9 +2,399 @@ from abc import ABC, abstractmethod
 import os
 import shutil
 import pandas as pd
-from typing import Union, Any
+from typing import Union, Any, Iterator
 import importlib.util
 import timeit
+import fnmatch
+import json
+import numpy as np
+from collections import deque, OrderedDict
+import threading
+import operator
+
+
+# Categories of every column loaded as categorical, shared across loads so that the integer codes of a
+# column mean the same value in every frame (new values are appended, existing codes never change)
+_SHARED_CATEGORIES = {}
+# Streamlit runs every session in its own thread, the read-extend-write of a column's categories is atomic
+_SHARED_CATEGORIES_LOCK = threading.Lock()
+
+
+def encode_categoricals(data: pd.DataFrame, columns: list) -> pd.DataFrame:
+    """
+    Convert columns to pandas categoricals using the process-wide shared categories.
+
+    Parameters:
+    -----------
+    data : pd.DataFrame
+        The data to convert (modified in place).
+    columns : list
+        The columns to convert, columns missing from data are ignored.
+
+    Returns:
+    --------
+    pd.DataFrame
+        The data with the columns converted.
+    """
+    for column in columns:
+        if column not in data.columns:
+            continue
+        values = data[column] if isinstance(data[column].dtype, pd.CategoricalDtype) else data[column].astype('category')
+        with _SHARED_CATEGORIES_LOCK:
+            known_categories = _SHARED_CATEGORIES.get(column, pd.Index([], dtype=values.cat.categories.dtype))
+            new_categories = values.cat.categories.difference(known_categories)
+            categories = known_categories.append(new_categories)
+            _SHARED_CATEGORIES[column] = categories
+        data[column] = values.cat.set_categories(categories)
+    return data
+
+
+def _categorical_read_kwargs(file_extension: str, categorical_columns: list, kwargs: dict) -> dict:
+    """
+    Ask pandas.read_csv to parse the categorical columns directly as categories.
+    """
+    if not categorical_columns or file_extension != '.csv':
+        return kwargs
+    dtype = kwargs.get('dtype') or {}
+    if not isinstance(dtype, dict):
+        return kwargs
+    return {**kwargs, 'dtype': {**{column: 'category' for column in categorical_columns}, **dtype}}
+
+
+def _copy_on_write_enabled() -> bool:
+    """
+    Check whether pandas copy-on-write is active (always on from pandas 3).
+    """
+    if int(pd.__version__.split('.')[0]) >= 3:
+        return True
+    try:
+        return pd.get_option('mode.copy_on_write') is True
+    except (AttributeError, KeyError):
+        return False
+
+
+class DataFrameCache(object):
+    """
+    Process-wide cache of loaded DataFrames, shared by every file manager so that Streamlit reruns do not
+    read the same file again.
+
+    Entries are keyed by path, modification time, size and read arguments, so a rewritten file is read
+    again. The least recently used frames are evicted once the cached frames exceed max_bytes.
+    """
+
+    def __init__(self, max_bytes: int = 2 * 1024 ** 3):
+        """
+        Initialize DataFrameCache with the maximum memory the cached frames may use.
+        """
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        # Guards the entries and current_bytes across sessions, like _SHARED_CATEGORIES_LOCK
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(file_path: str, **kwargs) -> tuple:
+        """
+        Build the cache key of a file read with the given arguments.
+
+        Parameters:
+        -----------
+        file_path : str
+            The path of the file.
+        **kwargs : dict
+            The arguments of the read (they may be unhashable, e.g. lists of columns).
+
+        Returns:
+        --------
+        tuple
+            The key, or raises FileNotFoundError if the file does not exist.
+        """
+        stat = os.stat(file_path)
+        return (os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size, repr(sorted(kwargs.items())))
+
+    @staticmethod
+    def _hand_out(data: pd.DataFrame) -> pd.DataFrame:
+        # With copy-on-write a shallow copy keeps the caller's writes away from the cached frame, without
+        # it only a deep copy does
+        return data.copy(deep=not _copy_on_write_enabled())
+
+    def get(self, key: tuple) -> Union[pd.DataFrame, None]:
+        """
+        Return a copy of the cached frame of key, or None if it is not cached.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            data = entry[0]
+        return self._hand_out(data)
+
+    def put(self, key: tuple, data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Cache data under key and return a copy of it for the caller.
+
+        Frames bigger than max_bytes are not cached.
+        """
+        size = int(data.memory_usage(index=True, deep=True).sum())
+        if size <= self.max_bytes:
+            with self._lock:
+                if key in self._entries:
+                    self.current_bytes -= self._entries.pop(key)[1]
+                self._entries[key] = (data, size)
+                self.current_bytes += size
+                while self.current_bytes > self.max_bytes:
+                    _, (_, evicted_size) = self._entries.popitem(last=False)
+                    self.current_bytes -= evicted_size
+        return self._hand_out(data)
+
+    def load(self, file_path: str, read_function, **kwargs) -> pd.DataFrame:
+        """
+        Return the cached frame of file_path read with kwargs, reading it with read_function on a miss.
+
+        Parameters:
+        -----------
+        file_path : str
+            The path of the file.
+        read_function : callable
+            Called as read_function(file_path, **kwargs) to read the file on a miss.
+        **kwargs : dict
+            The arguments of the read.
+
+        Returns:
+        --------
+        pd.DataFrame
+            A copy of the cached frame, the cached frame itself is never handed out.
+        """
+        key = self.make_key(file_path, **kwargs)
+        data = self.get(key)
+        if data is None:
+            data = self.put(key, read_function(file_path, **kwargs))
+        return data
+
+    def clear(self) -> None:
+        """
+        Drop every cached frame.
+        """
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+DATA_CACHE = DataFrameCache()
+
+
+# Operators of the (column, operator, value) filters of load_data, the same as pyarrow's Parquet filters
+_FILTER_OPERATORS = {
+    '=': operator.eq,
+    '==': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    'in': lambda values, value: values.isin(value),
+    'not in': lambda values, value: ~values.isin(value),
+}
+
+# Nullable extension arrays saved by save_column_store as their values plus a mask
+_MASKED_ARRAYS = (pd.arrays.IntegerArray, pd.arrays.FloatingArray, pd.arrays.BooleanArray)
+
+# Rows read at once when scanning a csv file with filters
+CSV_SCAN_CHUNK_SIZE = 1_000_000
+
+
+def _validate_filters(filters: list) -> list:
+    filters = [tuple(condition) for condition in filters]
+    for column, op, value in filters:
+        if op not in _FILTER_OPERATORS:
+            raise ValueError(f"Unsupported filter operator: {op}")
+    return filters
+
+
+def filter_mask(data: pd.DataFrame, filters: list) -> pd.Series:
+    """
+    Compute the rows of data matching every filter.
+
+    Parameters:
+    -----------
+    data : pd.DataFrame
+        The data to filter.
+    filters : list
+        (column, operator, value) conditions, e.g. [('Exchange', 'in', ['Exchange_1']), ('TimeStampEpoch', '>=', start)].
+        Timestamp values compare against string columns parsed as datetimes (in Parquet files these
+        conditions are applied after the read instead of being pushed down, see _split_parquet_filters).
+
+    Returns:
+    --------
+    pd.Series
+        Boolean mask of the matching rows.
+    """
+    mask = pd.Series(True, index=data.index)
+    for column, op, value in _validate_filters(filters):
+        values = data[column]
+        if isinstance(value, pd.Timestamp) and not pd.api.types.is_datetime64_any_dtype(values):
+            values = pd.to_datetime(values)
+        mask &= _FILTER_OPERATORS[op](values, value)
+    return mask
+
+
+def _read_columns(columns: list, filters: list) -> Union[list, None]:
+    # Columns to read: the requested ones plus the ones the filters need
+    if columns is None:
+        return None
+    return list(columns) + [column for column, _, _ in filters if column not in columns]
+
+
+def _split_parquet_filters(file_path: str, filters: list) -> tuple:
+    """
+    Split filters into the ones pyarrow can push down to the Parquet row groups and the ones applied with
+    filter_mask after the read: Timestamp values compared with a column not stored as timestamps (e.g. a
+    TimeStamp column kept as strings), which pyarrow cannot compare.
+    """
+    if not filters:
+        return filters, []
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pq.read_schema(file_path)
+    pushed_filters, post_filters = [], []
+    for condition in filters:
+        column, _, value = condition
+        values = value if isinstance(value, (list, tuple, set)) else [value]
+        if (any(isinstance(item, pd.Timestamp) for item in values)
+                and not pa.types.is_timestamp(schema.field(column).type)):
+            post_filters.append(condition)
+        else:
+            pushed_filters.append(condition)
+    return pushed_filters, post_filters
+
+
+def _select_rows_and_columns(chunk: pd.DataFrame, columns: list, filters: list) -> pd.DataFrame:
+    if filters:
+        chunk = chunk[filter_mask(chunk, filters)]
+    return chunk if columns is None else chunk[list(columns)]
+
+
+def iter_file_chunks(file_path: str, chunk_size: int = CSV_SCAN_CHUNK_SIZE, categorical_columns: list = None,
+                     columns: list = None, filters: list = None, time_column: str = 'TimeStamp',
+                     **kwargs) -> Iterator[pd.DataFrame]:
+    """
+    Read a file chunk by chunk, so that memory stays bounded by the chunk size whatever the file size.
+
+    Csv files are read with pandas.read_csv(chunksize=...), Parquet files batch by batch with pyarrow and
+    Excel files, which cannot be streamed, are read at once and then split.
+
+    Parameters:
+    -----------
+    file_path : str
+        The path of the file.
+    chunk_size : int
+        Number of rows read at once (chunks are smaller once filtered).
+    categorical_columns : list, optional
+        Columns to load as categoricals with shared categories, so codes match from one chunk to the next.
+    columns : list, optional
+        Only read these columns.
+    filters : list, optional
+        Only yield the rows matching every (column, operator, value) condition (see filter_mask).
+    time_column : str, optional
+        Parse this column as datetimes in every chunk, as Parquet files already store it (None leaves it as read).
+        Chunks are not sorted by it, rows come in file order.
+    **kwargs : dict
+        Additional keyword arguments to pass to the pandas reading function.
+
+    Returns:
+    --------
+    Iterator[pd.DataFrame]
+        The chunks, each with the typed columns of a full load.
+    """
+    file_extension = os.path.splitext(file_path)[1]
+    kwargs = _categorical_read_kwargs(file_extension, categorical_columns, kwargs)
+    filters = _validate_filters(filters) if filters else None
+    read_columns = _read_columns(columns, filters or [])
+
+    if file_extension == '.csv':
+        chunks = pd.read_csv(file_path, usecols=read_columns, chunksize=chunk_size, **kwargs)
+    elif file_extension in ['.parquet']:
+        import pyarrow.parquet as pq
+        batches = pq.ParquetFile(file_path).iter_batches(batch_size=chunk_size, columns=read_columns)
+        chunks = (batch.to_pandas(**kwargs) for batch in batches)
+    elif file_extension in ['.xlsx', '.xls']:
+        data = pd.read_excel(file_path, **kwargs)
+        chunks = (data.iloc[start:start + chunk_size] for start in range(0, len(data), chunk_size))
+    else:
+        raise ValueError(f"Unsupported file extension: {file_extension}")
+
+    for chunk in chunks:
+        chunk = _select_rows_and_columns(chunk, columns, filters)
+        if (time_column is not None and time_column in chunk.columns
+                and not pd.api.types.is_datetime64_any_dtype(chunk[time_column])):
+            chunk = chunk.assign(**{time_column: pd.to_datetime(chunk[time_column])})
+        if categorical_columns:
+            chunk = encode_categoricals(chunk.copy(), categorical_columns)
+        yield chunk
+
+
+def _read_csv_filtered(file_path: str, columns: list, filters: list, **kwargs) -> pd.DataFrame:
+    """
+    Scan a csv file chunk by chunk, keeping only the rows matching the filters.
+    """
+    # time_column is parsed by _read_file, once the chunks are put back together
+    chunks = list(iter_file_chunks(file_path, columns=columns, filters=filters, time_column=None, **kwargs))
+    return pd.concat(chunks, ignore_index=True)
+
+
+def _read_file(file_path: str, categorical_columns: list = None, columns: list = None, filters: list = None,
+               time_column: str = None, **kwargs) -> pd.DataFrame:
+    """
+    Read a csv, parquet or excel file with the appropriate pandas function.
+
+    Only the given columns are read, and filters are pushed down to the Parquet row groups or applied
+    while scanning the csv file in chunks, so the whole file is never held in memory. With time_column,
+    that column is parsed as datetimes and the rows are sorted by it, so a cached frame is ready to use.
+    """
+    file_extension = os.path.splitext(file_path)[1]
+    kwargs = _categorical_read_kwargs(file_extension, categorical_columns, kwargs)
+    filters = _validate_filters(filters) if filters else None
+
+    if file_extension == '.csv':
+        if filters:
+            data = _read_csv_filtered(file_path, columns, filters, **kwargs)
+        else:
+            data = pd.read_csv(file_path, usecols=columns, **kwargs)
+            data = data if columns is None else data[list(columns)]
+    elif file_extension in ['.parquet']:
+        pushed_filters, post_filters = _split_parquet_filters(file_path, filters)
+        data = pd.read_parquet(file_path, columns=_read_columns(columns, post_filters), filters=pushed_filters or None,
+                               **kwargs)
+        if post_filters:
+            data = _select_rows_and_columns(data, columns, post_filters).reset_index(drop=True)
+    elif file_extension in ['.xlsx', '.xls']:
+        data = pd.read_excel(file_path, **kwargs)
+        if filters:
+            data = data[filter_mask(data, filters)].reset_index(drop=True)
+        data = data if columns is None else data[list(columns)]
+    else:
+        raise ValueError(f"Unsupported file extension: {file_extension}")
+
+    # Shared categories so codes match across loads
+    if categorical_columns:
+        data = encode_categoricals(data, categorical_columns)
+    if time_column is not None:
+        if not pd.api.types.is_datetime64_any_dtype(data[time_column]):
+            data[time_column] = pd.to_datetime(data[time_column])
+        if not data[time_column].is_monotonic_increasing:
+            data = data.sort_values(time_column, kind='stable')
+    return data
+
+
+def _load_file(file_path: str, categorical_columns: list = None, use_cache: bool = False, **kwargs) -> pd.DataFrame:
+    if use_cache:
+        return DATA_CACHE.load(file_path, _read_file, categorical_columns=categorical_columns, **kwargs)
+    return _read_file(file_path, categorical_columns=categorical_columns, **kwargs)
 
 
 class FileManagerStatic(object):
@@ -34,7 +424,9 @@ class FileManagerStatic(object):
         """
         return os.path.join(self.base_directory, relative_path)
 
-    def load_data(self, relative_file_path: str, **kwargs) -> pd.DataFrame:
+    def load_data(self, relative_file_path: str, categorical_columns: list = None, use_cache: bool = False,
+                  columns: list = None, filters: list = None, time_column: str = None,
+                  **kwargs) -> pd.DataFrame:
         """
         Load data from a specified relative file path.
 
@@ -42,6 +434,17 @@ class FileManagerStatic(object):
         -----------
         relative_file_path : str
             The relative path to the file to read.
+        categorical_columns : list, optional
+            Columns to load as categoricals with shared categories (see encode_categoricals).
+        use_cache : bool, optional
+            Serve the data from the process-wide DATA_CACHE, the file is only read again once it changes.
+        columns : list, optional
+            Only read these columns.
+        filters : list, optional
+            Only read the rows matching every (column, operator, value) condition (see filter_mask), pushed
+            down to the Parquet row groups or applied while scanning the csv file in chunks.
+        time_column : str, optional
+            Parse this column as datetimes and sort the rows by it (stable), before the data is cached.
         **kwargs : dict
             Additional keyword arguments to pass to the pandas reading function.
 
@@ -51,16 +454,40 @@ class FileManagerStatic(object):
             The data read from the file.
         """
         full_file_path = self._get_full_path(relative_file_path)
-        file_extension = os.path.splitext(full_file_path)[1]
+        return _load_file(full_file_path, categorical_columns=categorical_columns, use_cache=use_cache,
+                          columns=columns, filters=filters, time_column=time_column, **kwargs)
 
-        if file_extension == '.csv':
-            return pd.read_csv(full_file_path, **kwargs)
-        elif file_extension in ['.xlsx', '.xls']:
-            return pd.read_excel(full_file_path, **kwargs)
-        elif file_extension in ['.parquet']:
-            return pd.read_parquet(full_file_path, **kwargs)
-        else:
-            raise ValueError(f"Unsupported file extension: {file_extension}")
+    def load_chunks(self, relative_file_path: str, chunk_size: int = CSV_SCAN_CHUNK_SIZE, categorical_columns: list = None,
+                    columns: list = None, filters: list = None, time_column: str = 'TimeStamp',
+                    **kwargs) -> Iterator[pd.DataFrame]:
+        """
+        Load data from a specified relative file path chunk by chunk (see iter_file_chunks).
+
+        Parameters:
+        -----------
+        relative_file_path : str
+            The relative path to the file to read.
+        chunk_size : int
+            Number of rows read at once.
+        categorical_columns : list, optional
+            Columns to load as categoricals with shared categories (see encode_categoricals).
+        columns : list, optional
+            Only read these columns.
+        filters : list, optional
+            Only yield the rows matching every (column, operator, value) condition (see filter_mask).
+        time_column : str, optional
+            Parse this column as datetimes in every chunk (None leaves it as read).
+        **kwargs : dict
+            Additional keyword arguments to pass to the pandas reading function.
+
+        Returns:
+        --------
+        Iterator[pd.DataFrame]
+            The chunks of the file.
+        """
+        full_file_path = self._get_full_path(relative_file_path)
+        return iter_file_chunks(full_file_path, chunk_size=chunk_size, categorical_columns=categorical_columns,
+                                columns=columns, filters=filters, time_column=time_column, **kwargs)
 
     def save_data(self, relative_file_path: str, data: pd.DataFrame, **kwargs) -> None:
         """
@@ -87,17 +514,133 @@ class FileManagerStatic(object):
         else:
             raise ValueError(f"Unsupported file extension: {file_extension}")
 
+    def save_column_store(self, relative_directory: str, data: pd.DataFrame) -> None:
+        """
+        Save data as a column store: one .npy file per column plus a columns.json metadata file.
+
+        Numeric, boolean and datetime columns are saved as they are, timezone-aware datetimes as their UTC
+        values with the timezone in the metadata and nullable (Int64, Float64, boolean) columns as their values
+        plus a .mask.npy file of the missing values. String, object and categorical columns are saved as their
+        integer category codes, with their categories in a json file next to them. Other extension dtypes
+        raise ValueError. The index is not saved.
+
+        Parameters:
+        -----------
+        relative_directory : str
+            The relative path of the directory of the store, created if needed.
+        data : pd.DataFrame
+            The data to save.
+        """
+        directory = self._get_full_path(relative_directory)
+        os.makedirs(directory, exist_ok=True)
+
+        columns = []
+        for position, (name, values) in enumerate(data.items()):
+            file_name = f'{position}.npy'
+            if isinstance(values.dtype, np.dtype) and values.dtype.kind in 'biufcmM':
+                np.save(os.path.join(directory, file_name), values.to_numpy())
+                columns.append({'name': name, 'file': file_name, 'kind': 'array'})
+                continue
+            if isinstance(values.dtype, pd.DatetimeTZDtype):
+                np.save(os.path.join(directory, file_name), values.dt.tz_convert(None).to_numpy())
+                columns.append({'name': name, 'file': file_name, 'kind': 'datetimetz', 'tz': str(values.dt.tz)})
+                continue
+            if isinstance(values.array, _MASKED_ARRAYS):
+                mask_file_name = f'{position}.mask.npy'
+                mask = values.isna().to_numpy()
+                np.save(os.path.join(directory, file_name),
+                        values.to_numpy(dtype=values.dtype.numpy_dtype, na_value=values.dtype.numpy_dtype.type(0)))
+                np.save(os.path.join(directory, mask_file_name), mask)
+                columns.append({'name': name, 'file': file_name, 'kind': 'masked', 'dtype': str(values.dtype),
+                                'mask_file': mask_file_name})
+                continue
+            if not (values.dtype == object or isinstance(values.dtype, (pd.CategoricalDtype, pd.StringDtype))):
+                raise ValueError(f"Unsupported dtype {values.dtype} of column {name!r} for the column store.")
+            if not isinstance(values.dtype, pd.CategoricalDtype):
+                values = values.astype('category')
+            np.save(os.path.join(directory, file_name), values.cat.codes.to_numpy())
+            # Categories in their own file, a column subset only reads the categories of its columns
+            categories_file_name = f'{position}.categories.json'
+            with open(os.path.join(directory, categories_file_name), 'w') as categories_file:
+                json.dump(values.cat.categories.tolist(), categories_file, default=str)
+            columns.append({'name': name, 'file': file_name, 'kind': 'categorical',
+                            'categories_file': categories_file_name, 'ordered': bool(values.cat.ordered)})
+
+        with open(os.path.join(directory, 'columns.json'), 'w') as metadata_file:
+            json.dump({'length': len(data), 'columns': columns}, metadata_file, default=str)
+
+    def load_column_store(self, relative_directory: str, columns: list = None) -> pd.DataFrame:
+        """
+        Load a column store saved by save_column_store without copying it.
+
+        Every column file is memory-mapped read-only, so only the pages actually used are read and processes
+        loading the same store share them through the OS page cache. Loading numeric columns does not depend
+        on their length, categorical columns come back as pandas categoricals over the mapped codes (only
+        their categories are read into memory).
+
+        Parameters:
+        -----------
+        relative_directory : str
+            The relative path of the directory of the store.
+        columns : list, optional
+            The columns to load, all of them by default.
+
+        Returns:
+        --------
+        pd.DataFrame
+            The data backed by the read-only memory-mapped column files, copy it before writing into it.
+        """
+        directory = self._get_full_path(relative_directory)
+        with open(os.path.join(directory, 'columns.json')) as metadata_file:
+            metadata = json.load(metadata_file)
+
+        stored_columns = {column['name']: column for column in metadata['columns']}
+        if columns is None:
+            columns = list(stored_columns)
+        missing_columns = [name for name in columns if name not in stored_columns]
+        if missing_columns:
+            raise KeyError(f"Columns not in the column store: {missing_columns}")
+
+        data = {}
+        for name in columns:
+            column = stored_columns[name]
+            values = np.load(os.path.join(directory, column['file']), mmap_mode='r')
+            if column['kind'] == 'categorical':
+                with open(os.path.join(directory, column['categories_file'])) as categories_file:
+                    dtype = pd.CategoricalDtype(json.load(categories_file), ordered=column['ordered'])
+                # The codes were written by pandas, skip the validation pass that would read every page
+                values = pd.Categorical.from_codes(values, dtype=dtype, validate=False)
+            elif column['kind'] == 'masked':
+                mask = np.load(os.path.join(directory, column['mask_file']), mmap_mode='r')
+                values = pd.api.types.pandas_dtype(column['dtype']).construct_array_type()(values, mask, copy=False)
+            elif column['kind'] == 'datetimetz':
+                values = pd.Series(values, name=name, copy=False).dt.tz_localize('UTC').dt.tz_convert(column['tz'])
+            data[name] = pd.Series(values, name=name, copy=False)
+        return pd.DataFrame(data, index=pd.RangeIndex(metadata['length']), copy=False)
+
 
 class FileManagerDynamic(object):
     """
     A class to manage file operations including loading and saving data.
     """
 
-    def __init__(self, ceiling_directory: str = None):
+    # Search results shared by every instance in the process:
+    # (target_name, start_path, search_type, ceiling_directory, max_depth, ignore_patterns) -> (path, modification times stamp)
+    _search_cache = {}
+
+    # Folders never entered by search
+    DEFAULT_IGNORE_PATTERNS = ('.git', '.hg', '.svn', '__pycache__', '.venv', 'venv', 'env', '.env', '*.egg-info',
+                               'node_modules', '.idea', '.vscode', '.pytest_cache', '.mypy_cache', '.ipynb_checkpoints')
+
+    def __init__(self, ceiling_directory: str = None, max_depth: int = None, ignore_patterns: tuple = DEFAULT_IGNORE_PATTERNS):
         """
         Initialize FileManagerDynamic class with optional ceiling directory.
         If ceiling directory is None, initialize it by stepping back n subdirectories.
+        max_depth limits how many levels below each searched directory are visited (None for no limit).
+        ignore_patterns are fnmatch patterns of folder names that search never enters.
         """
+        self.max_depth = max_depth
+        self.ignore_patterns = tuple(ignore_patterns)
         if ceiling_directory is None:
             self.set_ceiling_directory()
         else:
@@ -120,7 +663,7 @@ class FileManagerDynamic(object):
 
     def search(self, target_name: str, start_path: str, search_type: str = 'both') -> Union[str, None]:
         """
-        Search for a target starting from a given path using DFS.
+        Search for a target starting from a given path, using the process-wide search cache.
 
         Parameters
         ----------
@@ -136,50 +679,179 @@ class FileManagerDynamic(object):
         str or None
             The path where the target was found, or None if not found.
         """
+        key = (target_name, os.path.abspath(start_path), search_type, self.ceiling_directory, self.max_depth, self.ignore_patterns)
+        cached = FileManagerDynamic._search_cache.get(key)
+        if cached is not None and self._is_cache_entry_valid(key, *cached):
+            return cached[0]
+
+        scanned_directories = []
+        result = self._search_tree(target_name, start_path, search_type, scanned_directories=scanned_directories)
+        if result is None:
+            # Misses are not cached, the target may be created later anywhere in the tree
+            FileManagerDynamic._search_cache.pop(key, None)
+        else:
+            FileManagerDynamic._search_cache[key] = (result, self._search_stamp(scanned_directories))
+        return result
+
+    @staticmethod
+    def _search_stamp(scanned_directories: list) -> tuple:
+        """
+        Modification times of every directory the search scanned before finding its result, so a new entry in
+        any of them (e.g. a nearer match created in a subfolder of the start directory) invalidates the cache
+        entry. Checking the entry costs one stat per scanned directory, far less than listing them again.
+        """
+        try:
+            return tuple((directory, os.stat(directory).st_mtime_ns) for directory in scanned_directories)
+        except OSError:
+            return None
 
-        visited = set()
+    def _is_cache_entry_valid(self, key: tuple, result: str, stamp: tuple) -> bool:
+        """
+        Check that a cached search result still exists, has the right type and that nothing changed around it.
+        """
+        search_type = key[2]
+        if stamp is None or self._search_stamp([directory for directory, _ in stamp]) != stamp:
+            return False
+        if search_type == 'file':
+            return os.path.isfile(result)
+        if search_type == 'folder':
+            return os.path.isdir(result)
+        return os.path.exists(result)
+
+    @classmethod
+    def clear_search_cache(cls) -> None:
+        """
+        Forget every cached search result.
+        """
+        cls._search_cache.clear()
 
-        def dfs_search(current_path: str) -> Union[str, None]:
-            # Check if the current path has already been visited or if it's the ceiling directory
-            if current_path in visited or (self.ceiling_directory and current_path.endswith(self.ceiling_directory)):
-                return None
+    def warm_up(self, targets: list, start_path: str = None) -> dict:
+        """
+        Resolve a list of targets once per process so later searches are cache hits: the app calls it on every
+        Streamlit rerun, and only the first one walks the tree, the next ones validate the cached entries.
+
+        Parameters:
+        -----------
+        targets : list
+            (target_name, search_type) tuples, e.g. [('data', 'folder')].
+        start_path : str, optional
+            The path from where to start the searches. Defaults to the current working directory.
 
-            # Mark the current path as visited
-            visited.add(current_path)
+        Returns:
+        --------
+        dict
+            The path found for each target name (None if not found).
+        """
+        if start_path is None:
+            start_path = os.getcwd()
 
-            # Get a list of all names (files and folders) in the current directory
-            all_names = os.listdir(current_path)
+        # Only the first call of the process walks the tree, the next ones are validated cache hits
+        return {target_name: self.search(target_name=target_name, start_path=start_path, search_type=search_type)
+                for target_name, search_type in targets}
 
-            # Check if the target name exists in the current directory
-            if target_name in all_names:
-                # Construct the full path to the target
-                full_path = os.path.join(current_path, target_name)
-
-                # Validate against the search type ('file', 'folder', or 'both')
-                if (search_type == 'both' or
-                        (search_type == 'file' and os.path.isfile(full_path)) or
-                        (search_type == 'folder' and os.path.isdir(full_path))):
-                    return full_path  # Target found
-
-            # If target not found, search in sub-folders
-            for name in all_names:
-                new_path = os.path.join(current_path, name)
-                # If it's a directory, perform a DFS on it
-                if os.path.isdir(new_path):
-                    result = dfs_search(new_path)
-                    if result:
-                        return result  # Target found in one of the sub-folders
-
-            # If target is still not found, move up one directory and perform DFS
+    def _search_tree(self, target_name: str, start_path: str, search_type: str = 'both',
+                     scanned_directories: list = None) -> Union[str, None]:
+        """
+        Search for a target starting from a given path using an iterative BFS.
+
+        The tree below start_path is searched level by level (up to max_depth levels), so the nearest match
+        is returned first. If the target is not found, the search moves up one directory and searches the
+        parent's tree, skipping the directory already searched, until the ceiling directory is reached.
+
+        Parameters
+        ----------
+        target_name : str
+            The name of the target (file or folder) to search for.
+        start_path : str
+            The path from where to start the search.
+        search_type : str, optional
+            The type of element to search for ('file', 'folder', or 'both').
+        scanned_directories : list, optional
+            Filled with every directory listed by the search, in order.
+
+        Returns
+        -------
+        str or None
+            The path where the target was found, or None if not found.
+        """
+        current_path = os.path.abspath(start_path)
+        searched_path = None
+
+        while not self._is_ceiling(current_path):
+            result = self._bfs_search(target_name, current_path, search_type, skip_path=searched_path,
+                                      scanned_directories=scanned_directories)
+            if result:
+                return result  # Target found
+
+            # If target not found, move up one directory
             parent_path = os.path.dirname(current_path)
-            if parent_path and parent_path != current_path:
-                return dfs_search(parent_path)
+            if parent_path == current_path:
+                break
+            searched_path, current_path = current_path, parent_path
+
+        return None  # Target not found
 
-            return None  # Target not found
+    def _bfs_search(self, target_name: str, root_path: str, search_type: str, skip_path: str = None,
+                    scanned_directories: list = None) -> Union[str, None]:
+        """
+        Breadth-first search of a target below root_path with os.scandir.
+
+        DirEntry types come from the directory listing, so no extra stat call is made per entry.
+        Directories matching ignore_patterns and skip_path (already searched) are not entered.
+        Symlinked folders are followed like os.path.isdir did; every directory is entered once by its
+        real path, so links back to a parent do not loop.
+        """
+        root_real_path = os.path.realpath(root_path)
+        queue = deque([(root_path, root_real_path, 0)])
+        visited = {root_real_path}
+
+        while queue:
+            current_path, current_real_path, depth = queue.popleft()
+            try:
+                with os.scandir(current_path) as entries:
+                    entries = list(entries)
+            except OSError:
+                continue  # Unreadable or vanished directory
+            if scanned_directories is not None:
+                scanned_directories.append(current_path)
 
-        return dfs_search(start_path)
+            # Check if the target name exists in the current directory
+            for entry in entries:
+                if entry.name == target_name:
+                    # Validate against the search type ('file', 'folder', or 'both')
+                    if (search_type == 'both' or
+                            (search_type == 'file' and entry.is_file()) or
+                            (search_type == 'folder' and entry.is_dir())):
+                        return entry.path  # Target found
+
+            # Queue the sub-folders for the next level
+            if self.max_depth is not None and depth >= self.max_depth:
+                continue
+            for entry in entries:
+                if (entry.is_dir() and entry.path != skip_path
+                        and not any(fnmatch.fnmatch(entry.name, pattern) for pattern in self.ignore_patterns)):
+                    # Only links need resolving, a plain folder's real path is its parent's plus its name
+                    real_path = (os.path.realpath(entry.path) if entry.is_symlink()
+                                 else os.path.join(current_real_path, entry.name))
+                    if real_path not in visited:
+                        visited.add(real_path)
+                        queue.append((entry.path, real_path, depth + 1))
+
+        return None
+
+    def _is_ceiling(self, path: str) -> bool:
+        """
+        Check whether a path is the ceiling directory, given either as a full path or as a folder name.
+        """
+        if not self.ceiling_directory:
+            return False
+        if os.path.isabs(self.ceiling_directory):
+            return os.path.normcase(path) == os.path.normcase(os.path.normpath(self.ceiling_directory))
+        return os.path.basename(path) == self.ceiling_directory
 
-    def load_data(self, folder_name: str, file_name: str, **kwargs) -> pd.DataFrame:
+    def load_data(self, folder_name: str, file_name: str, categorical_columns: list = None, use_cache: bool = False,
+                  columns: list = None, filters: list = None, time_column: str = None,
+                  **kwargs) -> pd.DataFrame:
         """
         Load data from a specified folder and file.
 
@@ -189,6 +861,17 @@ class FileManagerDynamic(object):
             The name of the folder containing the file.
         file_name : str
             The name of the file to read.
+        categorical_columns : list, optional
+            Columns to load as categoricals with shared categories (see encode_categoricals).
+        use_cache : bool, optional
+            Serve the data from the process-wide DATA_CACHE, the file is only read again once it changes.
+        columns : list, optional
+            Only read these columns.
+        filters : list, optional
+            Only read the rows matching every (column, operator, value) condition (see filter_mask), pushed
+            down to the Parquet row groups or applied while scanning the csv file in chunks.
+        time_column : str, optional
+            Parse this column as datetimes and sort the rows by it (stable), before the data is cached.
         **kwargs : dict
             Additional keyword arguments to pass to the pandas reading function.
 
@@ -197,6 +880,50 @@ class FileManagerDynamic(object):
         pd.DataFrame
             The data read from the file.
         """
+        file_path = self._get_file_path(folder_name, file_name)
+
+        # Read the file with the pandas function of its extension, or serve it from the cache
+        return _load_file(file_path, categorical_columns=categorical_columns, use_cache=use_cache,
+                          columns=columns, filters=filters, time_column=time_column, **kwargs)
+
+    def load_chunks(self, folder_name: str, file_name: str, chunk_size: int = CSV_SCAN_CHUNK_SIZE,
+                    categorical_columns: list = None, columns: list = None, filters: list = None,
+                    time_column: str = 'TimeStamp', **kwargs) -> Iterator[pd.DataFrame]:
+        """
+        Load data from a specified folder and file chunk by chunk (see iter_file_chunks).
+
+        Parameters:
+        -----------
+        folder_name : str
+            The name of the folder containing the file.
+        file_name : str
+            The name of the file to read.
+        chunk_size : int
+            Number of rows read at once.
+        categorical_columns : list, optional
+            Columns to load as categoricals with shared categories (see encode_categoricals).
+        columns : list, optional
+            Only read these columns.
+        filters : list, optional
+            Only yield the rows matching every (column, operator, value) condition (see filter_mask).
+        time_column : str, optional
+            Parse this column as datetimes in every chunk (None leaves it as read).
+        **kwargs : dict
+            Additional keyword arguments to pass to the pandas reading function.
+
+        Returns:
+        --------
+        Iterator[pd.DataFrame]
+            The chunks of the file.
+        """
+        file_path = self._get_file_path(folder_name, file_name)
+        return iter_file_chunks(file_path, chunk_size=chunk_size, categorical_columns=categorical_columns,
+                                columns=columns, filters=filters, time_column=time_column, **kwargs)
+
+    def _get_file_path(self, folder_name: str, file_name: str) -> str:
+        """
+        Find folder_name from the current working directory and return the path of file_name in it.
+        """
         # Start from the current working directory
         start_path = os.getcwd()
 
@@ -206,22 +933,7 @@ class FileManagerDynamic(object):
             raise FileNotFoundError(f"Folder '{folder_name}' not found.")
 
         # Construct the complete file path
-        file_path = os.path.join(folder_path, file_name)
-
-        # Detect the file extension
-        file_extension = os.path.splitext(file_name)[1]
-
-        # Use the appropriate pandas function to read the file based on its extension
-        if file_extension == '.csv':
-            data = pd.read_csv(file_path, **kwargs)
-        elif file_extension in ['.parquet']:
-            data = pd.read_parquet(file_path, **kwargs)
-        elif file_extension in ['.xlsx', '.xls']:
-            data = pd.read_excel(file_path, **kwargs)
-        else:
-            raise ValueError(f"Unsupported file extension: {file_extension}")
-
-        return data
+        return os.path.join(folder_path, file_name)
 
     def save_data(self, folder_name: str, file_name: str, data: pd.DataFrame, **kwargs) -> None:
         """
@@ -1,21 +1,34 @@
 import pandas as pd
+from typing import Iterable, Iterator
 # from find_patterns import FindPatterns
 from utils.find_patterns import FindPatterns
 
 
 class FilterData:
-    def __init__(self, data: pd.DataFrame):
+    def __init__(self, data: pd.DataFrame, find_patterns: FindPatterns = None):
         self.data = self._verify_data(data)
-        self.find_patterns = FindPatterns(self.data)
+        # A FindPatterns of the same rows (e.g. FindPatterns.subset of the whole dataset) reuses its grouping
+        self.find_patterns = find_patterns if find_patterns is not None else FindPatterns(self.data)
 
     def _verify_data(self, data: pd.DataFrame) -> pd.DataFrame:
-        data['TimeStamp'] = pd.to_datetime(data['TimeStamp'], errors='coerce')
-        data['TimeStampEpoch'] = pd.to_numeric(data['TimeStampEpoch'], errors='coerce', downcast='integer')
-        data.sort_values('TimeStamp', inplace=True)
+        # Parse and sort only what is not done yet, on a shallow copy so the caller's frame is left as is.
+        # A parsed frame already in time order (an O(n) check) is used without any copy
+        parse_timestamp = not pd.api.types.is_datetime64_any_dtype(data['TimeStamp'])
+        parse_epoch = not pd.api.types.is_integer_dtype(data['TimeStampEpoch'])
+        if not (parse_timestamp or parse_epoch) and data['TimeStamp'].is_monotonic_increasing:
+            return data
+
+        data = data.copy(deep=False)
+        if parse_timestamp:
+            data['TimeStamp'] = pd.to_datetime(data['TimeStamp'], errors='coerce')
+        if parse_epoch:
+            data['TimeStampEpoch'] = pd.to_numeric(data['TimeStampEpoch'], errors='coerce', downcast='integer')
+        if not data['TimeStamp'].is_monotonic_increasing:
+            data = data.sort_values('TimeStamp', kind='stable')
         return data
 
     def get_top_tickers_by_message_type(self, n: int) -> pd.DataFrame:
-        unique_message_types = self.data.groupby('Symbol')['MessageType'].nunique()
+        unique_message_types = self.data.groupby('Symbol', observed=True)['MessageType'].nunique()
         top_tickers = unique_message_types.nlargest(n).index.tolist()
         return self.data[self.data['Symbol'].isin(top_tickers)]
 
@@ -23,7 +36,7 @@ class FilterData:
         return self.data[self.data['Symbol'].isin(tickers)]
 
     def get_top_tickers_by_order_count(self, n: int) -> pd.DataFrame:
-        order_counts = self.data.groupby('Symbol')['OrderID'].nunique()
+        order_counts = self.data.groupby('Symbol', observed=True)['OrderID'].nunique()
         top_tickers = order_counts.nlargest(n).index.tolist()
         return self.data[self.data['Symbol'].isin(top_tickers)]
 
@@ -47,6 +60,36 @@ class FilterData:
 
         return filtered_df.drop_duplicates()
 
+    def filter_by_message_type_query(self, prefix: list[str] = None, contains: list[str] = None,
+                                     min_length: int = None, max_length: int = None) -> pd.DataFrame:
+        # Orders whose sequence starts with prefix, contains the run contains and/or has a length in
+        # [min_length, max_length], answered by the trie index of FindPatterns
+        order_ids = self.find_patterns.trie_index().query(prefix=prefix, contains=contains,
+                                                          min_length=min_length, max_length=max_length)
+        return self.data[self.data['OrderID'].isin(order_ids)]
+
+    # Chunked versions of the filters, for data read with load_chunks: only one chunk of rows is held at a time
+
+    @staticmethod
+    def filter_chunks(chunks: Iterable[pd.DataFrame], exchanges: list = None, tickers: list = None) -> Iterator[pd.DataFrame]:
+        for chunk in chunks:
+            if exchanges is not None:
+                chunk = chunk[chunk['Exchange'].isin(exchanges)]
+            if tickers is not None:
+                chunk = chunk[chunk['Symbol'].isin(tickers)]
+            yield chunk
+
+    @staticmethod
+    def top_tickers_from_chunks(chunks: Iterable[pd.DataFrame], n: int, column: str = 'OrderID') -> list:
+        # Distinct (Symbol, column) pairs seen so far, column is 'OrderID' for the order count and
+        # 'MessageType' for the message type count. Only one chunk of rows is held at a time, but the pairs
+        # grow with the number of orders for 'OrderID' (symbols x message types for 'MessageType')
+        pairs = set()
+        for chunk in chunks:
+            pairs.update(chunk[['Symbol', column]].drop_duplicates().itertuples(index=False, name=None))
+        counts = pd.DataFrame(list(pairs), columns=['Symbol', column]).groupby('Symbol')[column].nunique()
+        return counts.nlargest(n).index.tolist()
+
 
 if __name__ == '__main__':
     print('This is filter_data.py')
@@ -1,26 +1,168 @@
+import hashlib
+from collections import OrderedDict
+import numpy as np
 import pandas as pd
+from typing import Iterable
+
+
+SEQUENCE_SEPARATOR = ' -> '
+
+# Grouped sequences shared by every FindPatterns instance: dataset fingerprint -> state (see _state)
+_SEQUENCE_CACHE = OrderedDict()
+SEQUENCE_CACHE_SIZE = 16
 
 
 class FindPatterns:
     def __init__(self, df: pd.DataFrame):
         self.df = df
+        # Trie of the MessageType sequences, filled by _encode_sequences
+        self.message_types = None
+        self.trie_parents = None
+        self.trie_labels = None
+        self._cached_state = None
 
-    def _group_by_order_id(self):
-        grouped = self.df.groupby('OrderID')['MessageType'].apply(lambda x: ' -> '.join(x)).reset_index(name='Sequence')
+    def _fingerprint(self):
+        # Hash of the OrderID and MessageType columns in row order, far cheaper than grouping them again
+        hashes = pd.util.hash_pandas_object(self.df[['OrderID', 'MessageType']], index=False).to_numpy()
+        return len(hashes), hashlib.blake2b(hashes.tobytes(), digest_size=16).hexdigest()
+
+    def _state(self):
+        # Grouping of the dataset computed once and memoized by fingerprint, with the views derived from it
+        # (counts, mapping, order -> pattern) filled in as they are asked for
+        if self._cached_state is None:
+            key = self._fingerprint()
+            state = _SEQUENCE_CACHE.get(key)
+            if state is None:
+                grouped = self._compute_grouped()
+                state = {'grouped': grouped, 'message_types': self.message_types, 'trie_parents': self.trie_parents,
+                         'trie_labels': self.trie_labels, 'views': {}}
+            self._remember(key, state)
+        return self._cached_state
+
+    def _remember(self, key, state):
+        _SEQUENCE_CACHE[key] = state
+        _SEQUENCE_CACHE.move_to_end(key)
+        while len(_SEQUENCE_CACHE) > SEQUENCE_CACHE_SIZE:
+            _SEQUENCE_CACHE.popitem(last=False)
+        self._use_state(state)
+
+    def _use_state(self, state):
+        self._cached_state = state
+        self.message_types = state['message_types']
+        self.trie_parents = state['trie_parents']
+        self.trie_labels = state['trie_labels']
+
+    @classmethod
+    def clear_cache(cls):
+        _SEQUENCE_CACHE.clear()
+
+    def subset(self, df_subset: pd.DataFrame):
+        # FindPatterns of a subset of the rows of this dataset. When it keeps whole orders (filtered on Exchange,
+        # Symbol or OrderID) its grouping is a mask of this one instead of a new grouping. The masked state
+        # stays on the subset instance, the shared cache only holds groupings computed from the data itself
+        subset = FindPatterns(df_subset)
+        state = self._state()
+        grouped = state['grouped']
+        order_ids = df_subset['OrderID'].unique()
+        # Every row of the kept orders must be in the subset, otherwise their sequences differ: regroup
+        if self.df['OrderID'].isin(order_ids).sum() != len(df_subset):
+            return subset
+        mask = grouped['OrderID'].isin(order_ids)
+        subset._use_state({**state, 'grouped': grouped[mask].reset_index(drop=True), 'views': {}})
+        return subset
+
+    def _encode_sequences(self):
+        # Every OrderID gets the id of the trie node of its MessageType sequence. The trie is built one
+        # position at a time for all the orders at once, so there is no Python call per order
+        order_codes, order_ids = pd.factorize(self.df['OrderID'], sort=True)
+        message_codes, self.message_types = pd.factorize(self.df['MessageType'], use_na_sentinel=False)
+        kept = order_codes >= 0
+        order_codes, message_codes = order_codes[kept], message_codes[kept]
+        n_message_types = max(len(self.message_types), 1)
+
+        # Position of every message in its order (rows keep their order inside an order, as in groupby)
+        rows = np.argsort(order_codes, kind='stable')
+        order_codes, message_codes = order_codes[rows], message_codes[rows]
+        lengths = np.bincount(order_codes, minlength=len(order_ids))
+        positions = np.arange(len(order_codes)) - (np.cumsum(lengths) - lengths)[order_codes]
+
+        # Messages grouped by position, each level of the trie is one contiguous slice
+        by_position = np.argsort(positions, kind='stable')
+        level_ends = np.cumsum(np.bincount(positions)) if len(positions) else np.array([], dtype=np.int64)
+
+        # Node 0 is the empty sequence, parents and labels rebuild the sequence of any node
+        nodes = np.zeros(len(order_ids), dtype=np.int64)
+        parents, labels = [np.array([-1])], [np.array([-1])]
+        n_nodes, level_start = 1, 0
+        for level_end in level_ends:
+            level = by_position[level_start:level_end]
+            level_orders = order_codes[level]
+            transitions = nodes[level_orders] * n_message_types + message_codes[level]
+            unique_transitions, children = np.unique(transitions, return_inverse=True)
+            nodes[level_orders] = n_nodes + children
+            parents.append(unique_transitions // n_message_types)
+            labels.append(unique_transitions % n_message_types)
+            n_nodes += len(unique_transitions)
+            level_start = level_end
+
+        self.trie_parents = np.concatenate(parents)
+        self.trie_labels = np.concatenate(labels)
+        return pd.DataFrame({'OrderID': order_ids, 'SequenceKey': nodes})
+
+    def _sequence_string(self, node):
+        # Human-readable sequence of a trie node, only built for distinct patterns
+        message_types = []
+        while node > 0:
+            message_types.append(str(self.message_types[self.trie_labels[node]]))
+            node = self.trie_parents[node]
+        return SEQUENCE_SEPARATOR.join(reversed(message_types))
+
+    def _compute_grouped(self):
+        encoded = self._encode_sequences()
+        keys, key_positions = np.unique(encoded['SequenceKey'].to_numpy(), return_inverse=True)
+        sequences = np.array([self._sequence_string(key) for key in keys], dtype=object)
+        grouped = encoded.assign(Sequence=sequences[key_positions])
         return grouped
 
+    def _group_by_order_id(self):
+        grouped = self._state()['grouped']
+        return grouped[['OrderID', 'Sequence']]
+
     def _find_patterns(self, grouped):
         pattern_counts = grouped['Sequence'].value_counts().to_dict()
         return pattern_counts
 
-    def _map_patterns(self, pattern_counts):
+    @staticmethod
+    def _map_patterns(pattern_counts):
         pattern_mapping = {v: f'pattern_{i + 1}' for i, v in enumerate(pattern_counts.keys())}
         return pattern_mapping
 
     def find_and_count_patterns(self):
-        grouped = self._group_by_order_id()
-        pattern_counts = self._find_patterns(grouped)
-        pattern_mapping = self._map_patterns(pattern_counts)
+        views = self._state()['views']
+        if 'patterns' not in views:
+            grouped = self._group_by_order_id()
+            pattern_counts = self._find_patterns(grouped)
+            pattern_mapping = self._map_patterns(pattern_counts)
+            pattern_full_counts = {pattern_mapping[sequence]: count for sequence, count in pattern_counts.items()}
+            views['patterns'] = (pattern_full_counts, pattern_mapping)
+        pattern_full_counts, pattern_mapping = views['patterns']
+        return dict(pattern_full_counts), dict(pattern_mapping)
+
+    @classmethod
+    def find_and_count_patterns_in_chunks(cls, chunks: Iterable[pd.DataFrame]):
+        # Same as find_and_count_patterns for data read with load_chunks. Only the MessageType sequence of
+        # every OrderID is kept between chunks, the rows themselves are dropped once counted: memory grows
+        # with the number of orders and their messages, not with the other columns
+        sequences = {}
+        for chunk in chunks:
+            chunk_sequences = chunk.groupby('OrderID', sort=False, observed=True)['MessageType'].agg(tuple)
+            for order_id, sequence in chunk_sequences.items():
+                sequences[order_id] = sequences.get(order_id, ()) + sequence
+
+        # In sorted OrderID order like the in-memory grouping, so tied counts get the same pattern numbers
+        pattern_counts = pd.Series([SEQUENCE_SEPARATOR.join(map(str, sequences[order_id])) for order_id in sorted(sequences)],
+                                   dtype=object).value_counts().to_dict()
+        pattern_mapping = cls._map_patterns(pattern_counts)
         pattern_full_counts = {pattern_mapping[sequence]: count for sequence, count in pattern_counts.items()}
         return pattern_full_counts, pattern_mapping
 
@@ -30,18 +172,203 @@ class FindPatterns:
         patterns_sorted = {k: v for k, v in sorted(patterns_with_arrows.items(), key=lambda item: item[1], reverse=True)}
         return patterns_sorted
 
+    def trie_index(self):
+        # Prefix trie index over the sequences of the dataset, built once from the cached grouping
+        views = self._state()['views']
+        if 'trie_index' not in views:
+            views['trie_index'] = SequenceTrieIndex(self)
+        return views['trie_index']
+
     def map_order_id_to_pattern(self):
-        grouped = self._group_by_order_id()
-        _, pattern_mapping = self.find_and_count_patterns()
+        # PatternID of every OrderID as a Series indexed by OrderID, mapped once per distinct sequence
+        views = self._state()['views']
+        if 'order_id_to_pattern' not in views:
+            grouped = self._group_by_order_id()
+            _, pattern_mapping = self.find_and_count_patterns()
+            patterns = grouped['Sequence'].map(pattern_mapping).fillna('unknown_pattern')
+            views['order_id_to_pattern'] = pd.Series(patterns.to_numpy(), index=pd.Index(grouped['OrderID'], name='OrderID'),
+                                                     name='PatternID')
+        return views['order_id_to_pattern'].copy(deep=False)
 
-        # Créer un dictionnaire pour mapper chaque séquence à son pattern correspondant
-        sequence_to_pattern = {sequence: pattern_mapping.get(sequence, 'unknown_pattern') for sequence in grouped['Sequence'].unique()}
 
-        # Mapper chaque OrderID à son pattern correspondant en utilisant le dictionnaire
-        order_id_to_pattern = {row['OrderID']: sequence_to_pattern[row['Sequence']] for index, row in grouped.iterrows()}
 
-        return order_id_to_pattern
+class SequenceTrieIndex:
+    # Index of the orders over the trie of their MessageType sequences built by FindPatterns._encode_sequences.
+    # Trie nodes are numbered in depth-first order, so the orders of a subtree (every order whose sequence
+    # starts with a given prefix) are one contiguous range of the orders sorted by node number: prefix,
+    # contains and length queries only touch the matching orders, not every order's sequence.
+    def __init__(self, find_patterns: FindPatterns):
+        state = find_patterns._state()
+        grouped = state['grouped']
+        self.message_types = pd.Index(state['message_types'])
+        parents = state['trie_parents'].tolist()
+        labels = state['trie_labels'].tolist()
+        n_nodes = len(parents)
 
+        # Children of every node and the (node, message code) -> child transitions
+        children = [[] for _ in range(n_nodes)]
+        self.transitions = {}
+        for node in range(1, n_nodes):
+            children[parents[node]].append(node)
+            self.transitions[(parents[node], labels[node])] = node
+
+        # Depth-first numbering: node -> first number of its subtree, and the size of its subtree
+        self.first = np.zeros(n_nodes, dtype=np.int64)
+        self.size = np.ones(n_nodes, dtype=np.int64)
+        self.depth = np.zeros(n_nodes, dtype=np.int64)
+        order, stack, number = [], [0], 0
+        while stack:
+            node = stack.pop()
+            self.first[node] = number
+            number += 1
+            order.append(node)
+            for child in reversed(children[node]):
+                self.depth[child] = self.depth[node] + 1
+                stack.append(child)
+        for node in reversed(order[1:]):
+            self.size[parents[node]] += self.size[node]
+        self.parents = np.asarray(parents, dtype=np.int64)
+        self.labels = np.asarray(labels, dtype=np.int64)
+
+        # Orders sorted by the number of their node, and by the length of their sequence
+        order_nodes = grouped['SequenceKey'].to_numpy()
+        self.order_ids = grouped['OrderID'].to_numpy()
+        self.by_node = np.argsort(self.first[order_nodes], kind='stable')
+        self.sorted_first = self.first[order_nodes][self.by_node]
+        self.by_length = np.argsort(self.depth[order_nodes], kind='stable')
+        self.sorted_length = self.depth[order_nodes][self.by_length]
+
+    def _codes(self, message_types):
+        codes = self.message_types.get_indexer(list(message_types))
+        return None if (codes < 0).any() else codes
+
+    def _subtree_positions(self, nodes):
+        # Positions (in the order table) of the orders in the subtrees of nodes, nested subtrees counted once
+        positions, covered_until = [], -1
+        for node in sorted(nodes, key=lambda node: self.first[node]):
+            start, end = self.first[node], self.first[node] + self.size[node]
+            if start < covered_until:
+                continue
+            covered_until = end
+            positions.append(self.by_node[np.searchsorted(self.sorted_first, start):np.searchsorted(self.sorted_first, end)])
+        return np.concatenate(positions) if positions else np.array([], dtype=np.int64)
+
+    def prefix_positions(self, message_types):
+        codes = self._codes(message_types)
+        if codes is None:
+            return np.array([], dtype=np.int64)
+        node = 0
+        for code in codes:
+            node = self.transitions.get((node, int(code)))
+            if node is None:
+                return np.array([], dtype=np.int64)
+        return self._subtree_positions([node])
+
+    def contains_positions(self, message_types):
+        codes = self._codes(message_types)
+        if codes is None:
+            return np.array([], dtype=np.int64)
+        # Nodes whose sequence ends with message_types, every order below one of them contains it
+        ends = np.flatnonzero(self.depth >= len(codes))
+        ancestors, matching = ends, np.ones(len(ends), dtype=bool)
+        for code in codes[::-1]:
+            matching &= self.labels[ancestors] == code
+            ancestors = self.parents[ancestors]
+        return self._subtree_positions(ends[matching])
+
+    def length_positions(self, min_length=None, max_length=None):
+        start = 0 if min_length is None else np.searchsorted(self.sorted_length, min_length, side='left')
+        end = len(self.sorted_length) if max_length is None else np.searchsorted(self.sorted_length, max_length, side='right')
+        return self.by_length[start:end]
+
+    def query(self, prefix=None, contains=None, min_length=None, max_length=None):
+        # OrderIDs matching every given condition: sequence starting with prefix, containing the contiguous
+        # run contains (e.g. ['Trade'] * 5 for a burst of 5 trades) and with min_length <= length <= max_length
+        matches = None
+        for positions in (self.prefix_positions(prefix) if prefix is not None else None,
+                          self.contains_positions(contains) if contains is not None else None,
+                          self.length_positions(min_length, max_length) if min_length is not None or max_length is not None else None):
+            if positions is not None:
+                matches = positions if matches is None else np.intersect1d(matches, positions, assume_unique=True)
+        if matches is None:
+            matches = np.arange(len(self.order_ids))
+        return set(self.order_ids[matches].tolist())
+
+
+class OnlinePatternCounter:
+    # Live pattern counts for messages appended in timestamp order. Every OrderID sits on a node of an
+    # automaton of the sequences observed so far, a message moves it to the child node of its MessageType,
+    # so counts and the order -> pattern map are kept current in O(1) per message without regrouping. Each node
+    # holds the set of the OrderIDs currently on it and its smallest OrderID, recomputed only when asked for
+    # after that order moved on, so tied counts are ordered as in the batch grouping by only sorting the
+    # distinct patterns. The state grows with the live orders and distinct sequences, not with the messages.
+    # Messages can be given one by one (update), as Events of FishFish (update_event) or as new rows of a
+    # DataFrame (update_frame), and find_and_count_patterns/map_order_id_to_pattern answer like FindPatterns.
+    def __init__(self):
+        # Node 0 is the empty sequence
+        self.transitions = {}
+        self.sequences = ['']
+        self.members = [set()]
+        # Smallest OrderID of every node, None once it left the node (recomputed by pattern_counts)
+        self.min_order_ids = [None]
+        self.order_nodes = {}
+
+    def update(self, order_id, message_type):
+        node = self.order_nodes.get(order_id, 0)
+        child = self.transitions.get((node, message_type))
+        if child is None:
+            child = len(self.sequences)
+            self.transitions[(node, message_type)] = child
+            self.sequences.append(f'{self.sequences[node]}{SEQUENCE_SEPARATOR}{message_type}' if node else str(message_type))
+            self.members.append(set())
+            self.min_order_ids.append(None)
+        if node:
+            self.members[node].discard(order_id)
+            if self.min_order_ids[node] == order_id:
+                self.min_order_ids[node] = None
+        members = self.members[child]
+        members.add(order_id)
+        min_order_id = self.min_order_ids[child]
+        if len(members) == 1 or (min_order_id is not None and order_id < min_order_id):
+            self.min_order_ids[child] = order_id
+        self.order_nodes[order_id] = child
+        return child
+
+    def update_event(self, event):
+        return self.update(event.order_id, event.message_type)
+
+    def update_frame(self, df: pd.DataFrame):
+        for order_id, message_type in zip(df['OrderID'].tolist(), df['MessageType'].tolist()):
+            self.update(order_id, message_type)
+
+    def order_pattern(self, order_id):
+        return self.sequences[self.order_nodes.get(order_id, 0)]
+
+    def pattern_counts(self):
+        # Same as FindPatterns._find_patterns: sequence -> number of orders, most frequent first, tied counts
+        # in the order of their smallest OrderID so they get the same pattern numbers as the batch grouping
+        patterns = []
+        for node in range(1, len(self.sequences)):
+            members = self.members[node]
+            if not members:
+                continue
+            if self.min_order_ids[node] is None:
+                self.min_order_ids[node] = min(members)
+            patterns.append((-len(members), self.min_order_ids[node], node))
+        patterns.sort()
+        return {self.sequences[node]: -count for count, _, node in patterns}
+
+    def find_and_count_patterns(self):
+        pattern_counts = self.pattern_counts()
+        pattern_mapping = FindPatterns._map_patterns(pattern_counts)
+        pattern_full_counts = {pattern_mapping[sequence]: count for sequence, count in pattern_counts.items()}
+        return pattern_full_counts, pattern_mapping
+
+    def map_order_id_to_pattern(self):
+        _, pattern_mapping = self.find_and_count_patterns()
+        node_patterns = np.array([pattern_mapping.get(sequence, 'unknown_pattern') for sequence in self.sequences], dtype=object)
+        nodes = np.fromiter(self.order_nodes.values(), dtype=np.int64, count=len(self.order_nodes))
+        return pd.Series(node_patterns[nodes], index=pd.Index(list(self.order_nodes), name='OrderID'), name='PatternID')
 
 
 if __name__ == '__main__':
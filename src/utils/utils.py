@@ -4,21 +4,85 @@ import time
 import json
 import csv
 import os
-from typing import List, Callable
+import re
+import heapq
+import itertools
+from typing import List, Callable, Iterator
 import streamlit as st
 import plotly.graph_objects as go
 import random
 import colorsys
+import weakref
+import threading
+from collections import OrderedDict
+import numpy as np
 
 
 # from src.utils.file_manager import FileManagerDynamic
 from utils.file_manager import FileManagerDynamic
 
 
+# String columns that are grouped, filtered and compared on, worth loading as categoricals
+CATEGORICAL_COLUMNS = ['Symbol', 'Exchange', 'MessageType', 'Direction']
+
+
+# Whitespace and commas between the records of a JSON list
+_JSON_SEPARATORS = re.compile(r'[\s,]*')
+
+
+def iter_json_records(json_file: str, buffer_size: int = 1 << 20) -> Iterator[dict]:
+    """
+    Iterate over the records of a JSON file containing a list, without loading the whole file.
+
+    Args:
+    json_file (str): Path of the JSON file.
+    buffer_size (int): Number of characters read from the file at once.
+
+    Returns:
+    Iterator[dict]: The records of the list, in file order.
+    """
+    decoder = json.JSONDecoder()
+
+    with open(json_file, 'r') as file:
+        # Leading whitespace can fill whole buffers, read until the first character
+        buffer, at_eof = '', False
+        while not buffer and not at_eof:
+            chunk = file.read(buffer_size)
+            at_eof = not chunk
+            buffer = (buffer + chunk).lstrip()
+        if not buffer.startswith('['):
+            raise ValueError(f"File {json_file} does not contain a valid JSON list.")
+        position = 1
+
+        while True:
+            position = _JSON_SEPARATORS.match(buffer, position).end()
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            if position < len(buffer):
+                try:
+                    record, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    pass
+                else:
+                    # A record ending with the buffer may go on in the next read (e.g. the number 45 of 456)
+                    if end < len(buffer) or at_eof:
+                        position = end
+                        yield record
+                        continue
+            # The next record is cut by the end of the buffer: read more and try again
+            if at_eof:
+                raise ValueError(f"File {json_file} does not contain a valid JSON list.")
+            chunk = file.read(buffer_size)
+            at_eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+
+
 def concat_json_to_csv(json_files: List[str], output_directory: str) -> str:
     """
     Concatenate JSON files and convert them into a single CSV file.
 
+    Records are streamed from the JSON files to the CSV file, so memory does not grow with the data.
+
     Args:
     json_files (List[str]): List of JSON file paths to concatenate.
     output_directory (str): Directory path to save the output CSV file.
@@ -30,34 +94,112 @@ def concat_json_to_csv(json_files: List[str], output_directory: str) -> str:
     if not os.path.exists(output_directory):
         os.makedirs(output_directory)
 
-    concatenated_data = []
-
-    for json_file in json_files:
-        with open(json_file, 'r') as file:
-            data = json.load(file)
-
-            if not isinstance(data, list):
-                raise ValueError(f"File {json_file} does not contain a valid JSON list.")
-
-            concatenated_data.extend(data)
+    records = itertools.chain.from_iterable(iter_json_records(json_file) for json_file in json_files)
+    first_record = next(records, None)
 
     output_csv_file = os.path.join(output_directory, 'exchange_concat.csv')
 
     with open(output_csv_file, 'w', newline='') as csv_file:
-        if concatenated_data:
-            writer = csv.DictWriter(csv_file, fieldnames=concatenated_data[0].keys())
+        if first_record is not None:
+            writer = csv.DictWriter(csv_file, fieldnames=first_record.keys())
             writer.writeheader()
-            writer.writerows(concatenated_data)
+            writer.writerow(first_record)
+            writer.writerows(records)
 
     return output_csv_file
 
 
-def read_data_csv(folder_name: str, file_name: str) -> pd.DataFrame:
+def _type_exchange_records(records: List[dict]) -> pd.DataFrame:
+    """
+    Build a typed DataFrame from exchange records: parsed timestamps, integer epochs and categoricals.
+    """
+    df = pd.DataFrame.from_records(records)
+    if 'TimeStamp' in df.columns:
+        df['TimeStamp'] = pd.to_datetime(df['TimeStamp']).astype('datetime64[ns]')
+    if 'TimeStampEpoch' in df.columns:
+        df['TimeStampEpoch'] = pd.to_numeric(df['TimeStampEpoch'])
+    for column in CATEGORICAL_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype('category')
+    return df
+
+
+def concat_json_to_parquet(json_files: List[str], output_directory: str, row_group_size: int = 100_000,
+                           sort_by_epoch: bool = False) -> str:
+    """
+    Concatenate JSON files into a single typed Parquet file, streaming one row group at a time.
+
+    TimeStamp is stored as a timestamp, TimeStampEpoch as an integer and CATEGORICAL_COLUMNS as
+    dictionary-encoded columns (read back as categoricals by pandas).
+
+    Args:
+    json_files (List[str]): List of JSON file paths to concatenate.
+    output_directory (str): Directory path to save the output Parquet file.
+    row_group_size (int): Number of records per row group (and held in memory at once).
+    sort_by_epoch (bool): k-way merge the files on TimeStampEpoch instead of concatenating them,
+        each file must already be sorted by TimeStampEpoch.
+
+    Returns:
+    str: Path of the created Parquet file.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    # Check and create output directory if not exists
+    if not os.path.exists(output_directory):
+        os.makedirs(output_directory)
+
+    record_iterators = [iter_json_records(json_file) for json_file in json_files]
+    if sort_by_epoch:
+        records = heapq.merge(*record_iterators, key=lambda record: record['TimeStampEpoch'])
+    else:
+        records = itertools.chain.from_iterable(record_iterators)
+
+    output_parquet_file = os.path.join(output_directory, 'exchange_concat.parquet')
+
+    # Declared types of the exchange columns, a row group can hold only nulls in a column (the OrderPrice of
+    # cancels) and must not decide its type. Categoricals get the same dictionary index type in every row group
+    column_types = {
+        'TimeStamp': pa.timestamp('ns'),
+        'TimeStampEpoch': pa.int64(),
+        'OrderID': pa.string(),
+        'OrderPrice': pa.float64(),
+    }
+    column_types.update({column: pa.dictionary(pa.int32(), pa.string()) for column in CATEGORICAL_COLUMNS})
+
+    writer = None
+    schema = None
+    try:
+        while True:
+            batch = list(itertools.islice(records, row_group_size))
+            if not batch:
+                break
+            df = _type_exchange_records(batch)
+            if writer is None:
+                # Other columns, if any, keep the type inferred from the first row group
+                inferred = pa.Schema.from_pandas(df, preserve_index=False)
+                schema = pa.schema([pa.field(column, column_types.get(column, inferred.field(column).type))
+                                    for column in df.columns])
+                writer = pq.ParquetWriter(output_parquet_file, schema)
+            writer.write_table(pa.Table.from_pandas(df, schema=schema, preserve_index=False), row_group_size=row_group_size)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    if writer is None:
+        pd.DataFrame().to_parquet(output_parquet_file)
+
+    return output_parquet_file
+
+
+def read_data_csv(folder_name: str, file_name: str, categorical: bool = False, use_cache: bool = False) -> pd.DataFrame:
     """
     Reads a CSV file and converts 'TimeStamp' and 'TimeStampEpoch' columns to datetime.
 
     Args:
     csv_path (str): Path to the CSV file.
+    categorical (bool): Load CATEGORICAL_COLUMNS as categoricals with shared categories (integer codes).
+    use_cache (bool): Serve the file from the process-wide load cache of file_manager.
 
     Returns:
     pd.DataFrame: DataFrame with converted datetime columns.
@@ -65,13 +207,10 @@ def read_data_csv(folder_name: str, file_name: str) -> pd.DataFrame:
 
     fmd = FileManagerDynamic(ceiling_directory="30_TradingClub")
 
-    df = fmd.load_data(folder_name=folder_name, file_name=file_name)
-
-    # Convert 'TimeStamp' to datetime
-    df['TimeStamp'] = pd.to_datetime(df['TimeStamp'])
-
-    # sort by timestamp
-    df = df.sort_values(by=['TimeStamp'])
+    # 'TimeStamp' is converted to datetime and sorted by the read, so a cached frame is not parsed again
+    df = fmd.load_data(folder_name=folder_name, file_name=file_name,
+                       categorical_columns=CATEGORICAL_COLUMNS if categorical else None, use_cache=use_cache,
+                       time_column='TimeStamp')
 
     return df
 
@@ -85,6 +224,133 @@ def filter_dataframe_by_tickers(df: pd.DataFrame, tickers: list[str]) -> pd.Data
 
 
 
+class TimeWindowIndex(object):
+    """
+    Binary-search index over the time column of a dataset, to slice time windows without scanning it.
+
+    The times are sorted once (kept as is when already sorted) and every window is then found with two
+    searchsorted calls and returned as a slice of the rows, in O(log n). The index only keeps the sorted
+    times, the row order and a weak reference to the dataset, so it never keeps a dataset alive.
+    Indexes are cached per dataset by for_dataset, so replay loops build them once.
+    """
+
+    # (id(df), column) -> (weak reference to df, number of rows, index), least recently used first
+    _cache = OrderedDict()
+    _cache_lock = threading.Lock()
+    CACHE_SIZE = 8
+
+    def __init__(self, df: pd.DataFrame, column: str = 'TimeStamp'):
+        """
+        Build the index of df over column.
+
+        Args:
+        df (pd.DataFrame): The dataset, it must not be modified while the index is used and must be kept
+            alive by the caller.
+        column (str): The time column, parsed as datetimes if needed.
+        """
+        times = df[column]
+        if not pd.api.types.is_datetime64_any_dtype(times):
+            times = pd.to_datetime(times)
+        if times.dt.tz is not None:
+            times = times.dt.tz_convert(None)
+        times = times.to_numpy(dtype='datetime64[ns]')
+        # Row positions in time order, None when the rows are already sorted
+        self._positions = None
+        if len(times) > 1 and (times[1:] < times[:-1]).any():
+            self._positions = np.argsort(times, kind='stable')
+            times = times[self._positions]
+        self._data = weakref.ref(df)
+        self.column = column
+        self._times = times
+
+    @property
+    def data(self) -> pd.DataFrame:
+        """
+        The indexed dataset (in its own row order).
+        """
+        df = self._data()
+        if df is None:
+            raise ReferenceError("The dataset of this TimeWindowIndex has been garbage collected.")
+        return df
+
+    @classmethod
+    def for_dataset(cls, df: pd.DataFrame, column: str = 'TimeStamp') -> 'TimeWindowIndex':
+        """
+        Return the cached index of df over column, building it on first use.
+
+        Only the CACHE_SIZE most recently used indexes are kept.
+
+        Args:
+        df (pd.DataFrame): The dataset.
+        column (str): The time column.
+
+        Returns:
+        TimeWindowIndex: The index, shared by every caller passing the same frame.
+        """
+        key = (id(df), column)
+        with cls._cache_lock:
+            entry = cls._cache.get(key)
+            if entry is not None and entry[0]() is df and entry[1] == len(df):
+                cls._cache.move_to_end(key)
+                return entry[2]
+        index = cls(df, column)
+        with cls._cache_lock:
+            cls._cache[key] = (weakref.ref(df), len(df), index)
+            cls._cache.move_to_end(key)
+            while len(cls._cache) > cls.CACHE_SIZE:
+                cls._cache.popitem(last=False)
+        # Forget the index with its dataset, before its id can be reused
+        weakref.finalize(df, cls._forget, key, index)
+        return index
+
+    @classmethod
+    def _forget(cls, key, index):
+        with cls._cache_lock:
+            entry = cls._cache.get(key)
+            if entry is not None and entry[2] is index:
+                del cls._cache[key]
+
+    def bounds(self, start, end) -> tuple:
+        """
+        Return the positions of the first row at or after start and of the first row at or after end.
+        """
+        start, end = self._to_datetime64(start), self._to_datetime64(end)
+        return int(self._times.searchsorted(start, side='left')), int(self._times.searchsorted(end, side='left'))
+
+    @staticmethod
+    def _to_datetime64(value) -> np.datetime64:
+        value = pd.Timestamp(value)
+        if value.tzinfo is not None:
+            value = value.tz_convert(None)
+        return value.to_datetime64().astype('datetime64[ns]')
+
+    def window(self, start, end) -> pd.DataFrame:
+        """
+        Return the rows with start <= time < end.
+
+        Args:
+        start: Start of the window (datetime, Timestamp or string).
+        end: End of the window, excluded.
+
+        Returns:
+        pd.DataFrame: The rows of the window in time order (a slice of the dataset when it is sorted).
+        """
+        first, last = self.bounds(start, end)
+        if self._positions is None:
+            return self.data.iloc[first:last]
+        return self.data.iloc[self._positions[first:last]]
+
+    def iter_windows(self, start, end, step=pd.Timedelta(1, unit='s')) -> Iterator[tuple]:
+        """
+        Yield (window start, rows) for consecutive windows of step from start up to end.
+        """
+        current_time = pd.Timestamp(start)
+        while current_time <= pd.Timestamp(end):
+            next_time = current_time + step
+            yield current_time, self.window(current_time, next_time)
+            current_time = next_time
+
+
 def display_data_3d_over_time(df):
     start_time = pd.Timestamp(year=2024, month=1, day=5, hour=9, minute=28, second=0)  # 9h28
     end_time = start_time + datetime.timedelta(minutes=4)  # 4 minutes plus tard (9h32)
@@ -92,49 +358,59 @@ def display_data_3d_over_time(df):
 
     exchange_mapping = {exchange: i for i, exchange in enumerate(df['Exchange'].unique(), 1)}
     pattern_mapping = {pattern: i for i, pattern in enumerate(df['PatternID'].unique())}
-    symbols_count = {}
-    pattern_colors = {}
-
-    fig = go.Figure(layout=dict(scene=dict(xaxis=dict(title='Time (seconds from 9:28)'),
-                                           yaxis=dict(title='Exchange', tickvals=list(exchange_mapping.values()), ticktext=list(exchange_mapping.keys())),
-                                           zaxis=dict(title='Pattern', tickvals=list(pattern_mapping.values()), ticktext=list(pattern_mapping.keys())))))
-    fig.update_layout(title="Event Visualization over Time", showlegend=False)
-
-    graph_placeholder = st.empty()
-
+    pattern_colors = ['#%02X%02X%02X' % tuple(int(random.random()*255) for _ in range(3)) for _ in pattern_mapping]
+    # Points are colored by their pattern number through this scale, numbers are validated much faster than color strings
+    pattern_colorscale = [[i / max(len(pattern_colors) - 1, 1), color] for i, color in enumerate(pattern_colors)]
+    if len(pattern_colorscale) < 2:
+        # A scale needs two ends: one pattern is drawn in its color, no rows (a filter matching nothing) in a
+        # placeholder one so the empty frames are still drawn
+        color = pattern_colors[0] if pattern_colors else '#000000'
+        pattern_colorscale = [[0, color], [1, color]]
+
+    time_index = TimeWindowIndex.for_dataset(df)
+
+    # One hidden trace per second, the figure is sent to the browser once and the replay runs there as a
+    # Plotly animation: each frame only makes its second visible, nothing is re-rendered by the server
+    traces = []
+    titles = []
     while current_time <= end_time:
         next_time = current_time + datetime.timedelta(seconds=1)
-        filtered_df = df.query("TimeStamp >= @current_time and TimeStamp < @next_time")
-
-        if not filtered_df.empty:
-            for _, row in filtered_df.iterrows():
-                exchange = row['Exchange']
-                pattern_id = row['PatternID']
-                symbol = row['Symbol']
-
-                if pattern_id not in pattern_colors:
-                    pattern_colors[pattern_id] = '#%02X%02X%02X' % tuple(int(random.random()*255) for _ in range(3))
-
-                if symbol not in symbols_count:
-                    symbols_count[symbol] = 1
-                else:
-                    symbols_count[symbol] += 1
-
-                x_value = (current_time - start_time).total_seconds()
-                y_value = exchange_mapping[exchange]
-                z_value = pattern_mapping[pattern_id]
-
-                fig.add_trace(go.Scatter3d(x=[x_value], y=[y_value], z=[z_value],
-                                           mode='markers',
-                                           marker=dict(size=3, color=pattern_colors[pattern_id]),
-                                           name=f"Pattern {pattern_id}" if f"Pattern {pattern_id}" not in [trace.name for trace in fig.data] else "",
-                                           hovertemplate=f"Pattern {pattern_id}<br>Time: {x_value}<br>Exchange: {exchange}<br>Symbol: {symbol}<extra></extra>"))
-        graph_placeholder.plotly_chart(fig, use_container_width=True)
-        time.sleep(1)
+        rows = time_index.window(current_time, next_time)
+        x_value = (current_time - start_time).total_seconds()
+        patterns = rows['PatternID'].astype(object)
+        pattern_numbers = patterns.map(pattern_mapping).to_numpy(dtype=float)
+
+        traces.append(dict(type='scatter3d',
+                           x=np.full(len(rows), x_value),
+                           y=rows['Exchange'].map(exchange_mapping).to_numpy(dtype=float),
+                           z=pattern_numbers,
+                           customdata=np.column_stack([patterns.to_numpy(), rows[['Exchange', 'Symbol']].to_numpy(dtype=object)]),
+                           mode='markers',
+                           marker=dict(size=3, color=pattern_numbers, colorscale=pattern_colorscale,
+                                       cmin=0, cmax=max(len(pattern_colors) - 1, 1)),
+                           visible=False,
+                           hovertemplate="Pattern %{customdata[0]}<br>Time: %{x}<br>Exchange: %{customdata[1]}<br>Symbol: %{customdata[2]}<extra></extra>"))
+        titles.append(f"Event Visualization over Time ({current_time.strftime('%H:%M:%S')})")
         current_time = next_time
 
+    # The first frame hides every later second so the replay can start over, the next ones show one more second
+    frames = [dict(name='0', data=[dict(type='scatter3d', visible=i == 0) for i in range(len(traces))],
+                   traces=list(range(len(traces))), layout=dict(title=titles[0]))]
+    frames += [dict(name=str(i), data=[dict(type='scatter3d', visible=True)], traces=[i], layout=dict(title=titles[i]))
+               for i in range(1, len(traces))]
 
-
+    fig = go.Figure(data=traces, frames=frames,
+                    layout=dict(scene=dict(xaxis=dict(title='Time (seconds from 9:28)', range=[0, (end_time - start_time).total_seconds()]),
+                                           yaxis=dict(title='Exchange', tickvals=list(exchange_mapping.values()), ticktext=list(exchange_mapping.keys())),
+                                           zaxis=dict(title='Pattern', tickvals=list(pattern_mapping.values()), ticktext=list(pattern_mapping.keys())))))
+    fig.update_layout(title="Event Visualization over Time", showlegend=False,
+                      updatemenus=[dict(type='buttons', showactive=False, buttons=[
+                          dict(label='Play', method='animate',
+                               args=[None, dict(frame=dict(duration=1000, redraw=True), transition=dict(duration=0), fromcurrent=False)]),
+                          dict(label='Pause', method='animate',
+                               args=[[None], dict(frame=dict(duration=0, redraw=False), mode='immediate')]),
+                      ])])
+    st.plotly_chart(fig, use_container_width=True)
 
 
 def graph_dataframe_rows_over_time(df: pd.DataFrame, processing_function: Callable, duration_minutes: int = 4):
@@ -176,7 +452,8 @@ def process_data_per_second(df: pd.DataFrame, current_time: datetime.datetime):
     current_time (datetime.datetime): The current timestamp to process.
     """
     next_time = current_time + datetime.timedelta(seconds=1)
-    filtered_df = df.query("MessageType == 'NewOrderRequest' and TimeStamp >= @current_time and TimeStamp < @next_time")
+    filtered_df = TimeWindowIndex.for_dataset(df).window(current_time, next_time)
+    filtered_df = filtered_df[filtered_df['MessageType'] == 'NewOrderRequest']
     count_per_symbol = filtered_df['Symbol'].value_counts()
 
     print(f"Time: {current_time.strftime('%Y-%m-%d %H:%M:%S')}")
@@ -194,6 +471,7 @@ if __name__ == "__main__":
     # output_directory = '../../data'
     # csv_path = '../../data/exchange_concat.csv'
     # csv_file = concat_json_to_csv(json_files, output_directory)
+    # parquet_file = concat_json_to_parquet(json_files, output_directory, sort_by_epoch=True)
 
     df = read_data_csv(file_name="exchange_concat.csv", folder_name="data")
     # print(df.head())
@@ -0,0 +1,46 @@
+import json
+import os
+
+import pandas as pd
+import pytest
+
+from utils.utils import concat_json_to_parquet, iter_json_records
+
+
+def record(i, message_type, price):
+    return {'TimeStamp': f'2024-01-05 09:28:{i:02d}.000001', 'TimeStampEpoch': 1704446880000001000 + i,
+            'Direction': 'NBFToExchange', 'OrderID': f'order_{i}', 'MessageType': message_type,
+            'Symbol': 'AAA', 'OrderPrice': price, 'Exchange': 'Exchange_1'}
+
+
+def test_null_prices_in_first_row_group(tmp_path):
+    pytest.importorskip('pyarrow')
+    # The first row group only holds cancels, without prices
+    records = [record(i, 'Cancelled', None) for i in range(4)] + [record(i, 'NewOrderRequest', 12.5) for i in range(4, 8)]
+    json_file = os.path.join(tmp_path, 'exchange.json')
+    with open(json_file, 'w') as file:
+        json.dump(records, file)
+
+    df = pd.read_parquet(concat_json_to_parquet([json_file], str(tmp_path), row_group_size=4))
+    assert len(df) == 8
+    assert df['OrderPrice'].dtype == 'float64'
+    assert df['OrderPrice'].isna().sum() == 4
+    assert df['TimeStampEpoch'].dtype == 'int64'
+
+
+@pytest.mark.parametrize('buffer_size', [1, 2, 5, 7, 1 << 20])
+def test_records_cut_by_the_buffer(tmp_path, buffer_size):
+    json_file = os.path.join(tmp_path, 'records.json')
+    records = [1, 23, 456, {'OrderID': 'order_1', 'OrderPrice': 12.5}, 'abc', None, [7, 89]]
+    with open(json_file, 'w') as file:
+        file.write(' ' * 12 + '\n' + json.dumps(records) + '\n')
+    assert list(iter_json_records(json_file, buffer_size=buffer_size)) == records
+
+
+@pytest.mark.parametrize('content', ['', '   ', '{"a": 1}', '[1, 2', '[1, 23'])
+def test_invalid_lists(tmp_path, content):
+    json_file = os.path.join(tmp_path, 'records.json')
+    with open(json_file, 'w') as file:
+        file.write(content)
+    with pytest.raises(ValueError):
+        list(iter_json_records(json_file, buffer_size=5))
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.FishFish import DurationStats, Exchange
+
+
+def make_feed(n_orders=1500, n_symbols=15, seed=0, exchanges=('Exchange_1', 'Exchange_2', 'Exchange_3')):
+    # Orders spread over 4 minutes: cancelled, traded, rejected, left open or cancels without an order
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp('2024-01-05 09:28:00').value
+    symbols = [f'S{i:03d}' for i in range(n_symbols)]
+    rows = []
+    for i in range(n_orders):
+        exchange = exchanges[rng.integers(len(exchanges))]
+        symbol = symbols[min(int(rng.exponential(n_symbols / 4)), n_symbols - 1)]
+        timestamp = start + int(rng.integers(240 * 10**9))
+        price = round(float(rng.uniform(1, 300)), 2)
+        kind = rng.random()
+        if kind < 0.03:
+            sequence = ['CancelRequest', 'CancelAcknowledged', 'Cancelled']
+        elif kind < 0.1:
+            sequence = ['NewOrderRequest', 'NewOrderAcknowledged'] + ['Trade'] * int(rng.integers(1, 4))
+        elif kind < 0.8:
+            sequence = ['NewOrderRequest', 'NewOrderAcknowledged', 'CancelRequest', 'CancelAcknowledged', 'Cancelled']
+        elif kind < 0.9:
+            sequence = ['NewOrderRequest', 'Rejected']
+        else:
+            sequence = ['NewOrderRequest', 'NewOrderAcknowledged']
+        for message_type in sequence:
+            timestamp += int(rng.exponential(5e7 if rng.random() > 0.02 else 5e9)) + 1
+            direction = 'NBFToExchange' if message_type in ('NewOrderRequest', 'CancelRequest') else 'ExchangeToNBF'
+            rows.append((timestamp, direction, f'order_{i:05d}', message_type, symbol,
+                         np.nan if 'Cancel' in message_type else price, exchange))
+    df = pd.DataFrame(rows, columns=['TimeStampEpoch', 'Direction', 'OrderID', 'MessageType', 'Symbol', 'OrderPrice', 'Exchange'])
+    df = df.sort_values('TimeStampEpoch', kind='stable').reset_index(drop=True)
+    df.insert(0, 'TimeStamp', pd.to_datetime(df['TimeStampEpoch']).astype(str))
+    return df
+
+
+def reference_flags(exchange, df):
+    # Row by row: the OrderID is in a Flagged Trades set, the Symbol in a Novelty set, after the row
+    first_timestamp = pd.to_datetime(df['TimeStamp']).iloc[0]
+    exchange_stats = {}
+    symbol_counts = None
+    stale, novel = [], []
+    for event in exchange.events(df):
+        exchange_stats = exchange.update_exchanges(exchange_stats, event, first_timestamp)
+        symbol_counts = exchange.novelSymbol(symbol_counts, event, first_timestamp)
+        stale.append(any(event.order_id in stats['Flagged Trades'] for stats in exchange_stats.values()))
+        novel.append(symbol_counts.is_novel(event.symbol))
+    return np.array(stale), np.array(novel)
+
+
+@pytest.fixture(scope='module')
+def feed():
+    return make_feed()
+
+
+@pytest.mark.parametrize('streaming_stats', [False, True])
+@pytest.mark.parametrize('stddev_multiplier', [1, 3])
+def test_detect_all_matches_update_exchanges(feed, streaming_stats, stddev_multiplier):
+    exchange = Exchange(feed, streaming_stats=streaming_stats, stddev_multiplier=stddev_multiplier)
+    stale, novel = reference_flags(exchange, feed)
+    assert stale.any() and novel.any()
+
+    flags = exchange.detect_all(feed)
+    np.testing.assert_array_equal(flags['StaleOrder'].to_numpy(), stale)
+    np.testing.assert_array_equal(flags['NovelSymbol'].to_numpy(), novel)
+    np.testing.assert_array_equal(flags['RowFlagged'].to_numpy(), (stale | novel).astype(int))
+
+
+@pytest.mark.parametrize('max_workers', [1, 2])
+def test_detect_all_parallel_matches_detect_all(feed, max_workers):
+    exchange = Exchange(feed, stddev_multiplier=3)
+    flags, frequency_stats = exchange.detect_all_parallel(feed, max_workers=max_workers)
+    pd.testing.assert_frame_equal(flags, exchange.detect_all(feed))
+    pd.testing.assert_frame_equal(frequency_stats, exchange.price_frequency_table(feed))
+
+    stale, novel = reference_flags(exchange, feed)
+    np.testing.assert_array_equal(flags['StaleOrder'].to_numpy(), stale)
+    np.testing.assert_array_equal(flags['NovelSymbol'].to_numpy(), novel)
+
+
+def test_decayed_stats_are_rejected(feed):
+    exchange = Exchange(feed, streaming_stats=True, decay=0.05)
+    with pytest.raises(ValueError):
+        exchange.detect_all(feed)
+    with pytest.raises(ValueError):
+        exchange.detect_all_parallel(feed, max_workers=1)
+
+
+def test_decay_needs_streaming_stats(feed):
+    with pytest.raises(ValueError):
+        Exchange(feed, decay=0.05)
+
+
+@pytest.mark.parametrize('decay', [None, 0.05, 0.5, 1])
+def test_duration_stats_match_direct_computation(decay):
+    durations = np.random.default_rng(0).exponential(2.0, 200)
+    stats = DurationStats(decay)
+    for duration in durations:
+        stats.update(duration)
+    if decay is None:
+        expected_mean, expected_std = durations.mean(), durations.std(ddof=1)
+    else:
+        # Exponentially weighted: the newest duration weighs decay, the first one what is left
+        weights = decay * (1 - decay) ** np.arange(len(durations) - 1, -1, -1)
+        weights[0] = (1 - decay) ** (len(durations) - 1)
+        expected_mean = np.sum(weights * durations)
+        expected_std = np.sqrt(np.sum(weights * (durations - expected_mean) ** 2))
+    assert stats.mean == pytest.approx(expected_mean, rel=1e-9)
+    assert stats.std() == pytest.approx(expected_std, rel=1e-9, abs=1e-12)
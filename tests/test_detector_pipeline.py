@@ -0,0 +1,99 @@
+import pandas as pd
+import pytest
+
+from test_detect_all import make_feed
+from utils.detector_pipeline import DetectorPipeline, DetectorRule, Flag, FlagRegistry, FrequencyBurstRule, StaleOrderRule
+from utils.FishFish import Event, Exchange
+
+
+@pytest.fixture(scope='module')
+def feed():
+    return make_feed()
+
+
+def reference_sets(exchange, df):
+    # Flagged Trades and Novelty sets of every exchange after the last row of update_exchanges and novelSymbol
+    first_timestamp = pd.to_datetime(df['TimeStamp']).iloc[0]
+    exchange_stats = {}
+    symbol_counts = None
+    for event in exchange.events(df):
+        exchange_stats = exchange.update_exchanges(exchange_stats, event, first_timestamp)
+        symbol_counts = exchange.novelSymbol(symbol_counts, event, first_timestamp)
+    stale = set().union(*(stats['Flagged Trades'] for stats in exchange_stats.values()))
+    return stale, symbol_counts.novel_symbols()
+
+
+def test_incomplete_rule_fails_when_created():
+    class NoEventRule(DetectorRule):
+        name = 'NoEvent'
+
+    with pytest.raises(TypeError):
+        NoEventRule()
+
+
+@pytest.mark.parametrize('stddev_multiplier', [1, 3])
+def test_default_rules_match_detect_all(feed, stddev_multiplier):
+    flags = list(DetectorPipeline.default(stddev_multiplier).run_frame(feed))
+    flagged_orders = {flag.key for flag in flags if flag.rule == 'StaleOrder'}
+    flagged_symbols = {flag.key for flag in flags if flag.rule == 'NovelSymbol'}
+    exchange = Exchange(feed, stddev_multiplier=stddev_multiplier)
+    stale, novel = reference_sets(exchange, feed)
+    assert stale and novel
+    assert flagged_orders == stale
+    assert flagged_symbols == novel
+
+    # detect_all only marks the rows after a flag, orders flagged after their last row are not in it
+    detected = exchange.detect_all(feed)
+    assert set(feed['OrderID'][detected['StaleOrder']]) <= flagged_orders
+    assert set(feed['Symbol'][detected['NovelSymbol']]) <= flagged_symbols
+
+
+def test_stale_order_rule_with_decayed_stats(feed):
+    # Decayed stats are only available row by row, the rule gives the flags of update_exchanges
+    exchange = Exchange(feed, streaming_stats=True, decay=0.05)
+    stale, _ = reference_sets(exchange, feed)
+    flags = list(DetectorPipeline([StaleOrderRule(decay=0.05)]).run_frame(feed))
+    assert stale
+    assert [flag.key for flag in flags] == list(dict.fromkeys(flag.key for flag in flags))
+    assert {flag.key for flag in flags} == stale
+
+
+def test_frequency_burst_threshold():
+    second = 10**9
+    start = pd.Timestamp('2024-01-05 09:30:00').value
+    # 6 messages in the first second, 4 in the next one, 3 in the last one
+    offsets = [0, 1, 2, 3, 4, 5] + [second + i for i in range(4)] + [2 * second + i for i in range(3)]
+    events = [Event(start + offset, start + offset, 'NBFToExchange', f'order_{i}', 'NewOrderRequest', 'AAA', 1.0, 'Exchange_1')
+              for i, offset in enumerate(offsets)]
+    flags = list(DetectorPipeline([FrequencyBurstRule(max_messages=3)]).run(events))
+    assert [flag.key for flag in flags] == [pd.Timestamp(start), pd.Timestamp(start + second)]
+    assert [flag.timestamp for flag in flags] == [events[3].timestamp, events[9].timestamp]
+
+
+@pytest.mark.parametrize('stddev_multiplier', [1, 3])
+def test_flag_frame_matches_detect_all(feed, stddev_multiplier):
+    flags = DetectorPipeline.default(stddev_multiplier).flag_frame(feed, chunk_size=500)
+    detected = Exchange(feed, stddev_multiplier=stddev_multiplier).detect_all(feed)
+    pd.testing.assert_series_equal(flags['RowFlagged'], detected['RowFlagged'])
+    assert set(flags['FlagReason'].dropna()) == {'StaleOrder', 'NovelSymbol'}
+    assert flags['FlagExchange'].notna().equals(flags['RowFlagged'].astype(bool))
+
+
+def test_flag_registry_lookup():
+    registry = FlagRegistry()
+    novel = Flag('NovelSymbol', 'AAA', 'Exchange_2', 1)
+    stale = Flag('StaleOrder', 'order_1', 'Exchange_1', 2)
+    assert registry.add(novel)
+    assert registry.lookup('order_1', 'AAA') is novel
+    assert registry.add(stale)
+    assert registry.lookup('order_1', 'AAA') is stale
+    assert registry.lookup('order_2', 'AAA') is novel
+    assert registry.lookup('order_2', 'BBB') is None
+
+    # Only the first flag of a key is kept, bursts are not about a row
+    assert not registry.add(Flag('StaleOrder', 'order_1', 'Exchange_3', 3))
+    assert not registry.add(Flag('NovelSymbol', 'AAA', 'Exchange_3', 3))
+    assert not registry.add(Flag('FrequencyBurst', pd.Timestamp(0), 'Exchange_1', 4))
+    assert registry.lookup('order_1', 'AAA') is stale
+    assert registry.lookup('order_2', 'AAA') is novel
+    assert len(registry) == 2
@@ -0,0 +1,30 @@
+import threading
+
+import pandas as pd
+
+from utils import file_manager
+from utils.file_manager import encode_categoricals
+
+
+def test_concurrent_loads_share_codes():
+    column = 'ConcurrentTestSymbol'
+    frames = [pd.DataFrame({column: [f'SYM{thread}_{i}' for i in range(200)] + ['COMMON']}) for thread in range(8)]
+    barrier = threading.Barrier(len(frames))
+
+    def encode(df):
+        barrier.wait()
+        encode_categoricals(df, [column])
+
+    threads = [threading.Thread(target=encode, args=(df,)) for df in frames]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    categories = file_manager._SHARED_CATEGORIES[column]
+    assert categories.is_unique
+    assert len(categories) == 8 * 200 + 1
+    for df in frames:
+        # Every frame's codes point into the final shared categories
+        codes = df[column].cat.codes.to_numpy()
+        assert (categories[codes] == df[column].astype(str).to_numpy()).all()
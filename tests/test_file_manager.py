@@ -0,0 +1,136 @@
+import pickle
+
+import numpy as np
+import pytest
+import pandas as pd
+
+from utils.file_manager import DATA_CACHE, FileManagerStatic
+from utils.filter_data import FilterData
+
+
+def write_feed(directory, n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    epoch = pd.Timestamp('2024-01-05 09:28:00').value + rng.integers(0, 240 * 10**9, n)
+    df = pd.DataFrame({
+        'TimeStamp': pd.to_datetime(epoch).astype(str),
+        'TimeStampEpoch': epoch,
+        'OrderID': [f'order_{i}' for i in range(n)],
+        'MessageType': 'NewOrderRequest',
+        'Symbol': rng.choice(['AAA', 'BBB'], n),
+        'Exchange': 'Exchange_1',
+    })
+    df.to_csv(directory / 'feed.csv', index=False)
+    return df
+
+
+def test_cached_load_is_parsed_and_sorted(tmp_path):
+    write_feed(tmp_path)
+    fms = FileManagerStatic(str(tmp_path))
+    DATA_CACHE.clear()
+    for _ in range(2):
+        df = fms.load_data('feed.csv', use_cache=True, time_column='TimeStamp')
+        assert pd.api.types.is_datetime64_any_dtype(df['TimeStamp'])
+        assert df['TimeStamp'].is_monotonic_increasing
+        # Nothing left to parse or sort
+        assert FilterData(df).data is df
+    assert len(DATA_CACHE) == 1
+
+
+def test_timestamp_filter_on_string_column(tmp_path):
+    pytest.importorskip('pyarrow')
+    df = write_feed(tmp_path)
+    df.to_parquet(tmp_path / 'feed.parquet', index=False)
+    fms = FileManagerStatic(str(tmp_path))
+    start = pd.Timestamp('2024-01-05 09:30:00')
+    filters = [('TimeStamp', '>=', start), ('Symbol', '==', 'AAA')]
+    expected = df[(pd.to_datetime(df['TimeStamp']) >= start) & (df['Symbol'] == 'AAA')]
+    for file_name in ('feed.csv', 'feed.parquet'):
+        data = fms.load_data(file_name, columns=['OrderID'], filters=filters)
+        assert list(data.columns) == ['OrderID']
+        assert sorted(data['OrderID']) == sorted(expected['OrderID'])
+
+
+
+@pytest.mark.parametrize('file_name', ['feed.csv', 'feed.parquet'])
+def test_chunks_are_typed_like_parquet(tmp_path, file_name):
+    df = write_feed(tmp_path)
+    if file_name.endswith('.parquet'):
+        pytest.importorskip('pyarrow')
+        df.to_parquet(tmp_path / file_name, index=False)
+    fms = FileManagerStatic(str(tmp_path))
+    expected = fms.load_data('feed.csv', time_column='TimeStamp').sort_index()
+    chunks = list(fms.load_chunks(file_name, chunk_size=64))
+    assert all(pd.api.types.is_datetime64_any_dtype(chunk['TimeStamp']) for chunk in chunks)
+    data = pd.concat(chunks, ignore_index=True)
+    pd.testing.assert_frame_equal(data, expected.reset_index(drop=True), check_dtype=False)
+    # Projected chunks without the time column
+    assert list(next(fms.load_chunks(file_name, columns=['OrderID'])).columns) == ['OrderID']
+
+def test_search_cache_sees_nearer_match(tmp_path):
+    from utils.file_manager import FileManagerDynamic
+
+    start_path = tmp_path / 'project' / 'src' / 'utils'
+    start_path.mkdir(parents=True)
+    (tmp_path / 'project' / 'data').mkdir()
+    fm = FileManagerDynamic(ceiling_directory=str(tmp_path))
+    FileManagerDynamic.clear_search_cache()
+
+    assert fm.search('data', str(start_path), 'folder') == str(tmp_path / 'project' / 'data')
+    # A nearer match in an intermediate directory, neither the start directory nor the old result's parent change
+    (tmp_path / 'project' / 'src' / 'data').mkdir()
+    assert fm.search('data', str(start_path), 'folder') == str(tmp_path / 'project' / 'src' / 'data')
+
+
+def test_search_cache_sees_nearer_match_in_subfolder(tmp_path):
+    from utils.file_manager import FileManagerDynamic
+
+    start_path = tmp_path / 'project' / 'src'
+    (start_path / 'sub').mkdir(parents=True)
+    (tmp_path / 'project' / 'data').mkdir()
+    fm = FileManagerDynamic(ceiling_directory=str(tmp_path))
+    FileManagerDynamic.clear_search_cache()
+
+    assert fm.warm_up([('data', 'folder')], str(start_path)) == {'data': str(tmp_path / 'project' / 'data')}
+    # A nearer match inside a subfolder the search scanned, off the path to the cached result
+    (start_path / 'sub' / 'data').mkdir()
+    assert fm.search('data', str(start_path), 'folder') == str(start_path / 'sub' / 'data')
+
+
+
+def test_search_follows_symlinked_folders(tmp_path):
+    from utils.file_manager import FileManagerDynamic
+
+    start_path = tmp_path / 'project' / 'src'
+    start_path.mkdir(parents=True)
+    (tmp_path / 'external' / 'data').mkdir(parents=True)
+    (start_path / 'shared').symlink_to(tmp_path / 'external', target_is_directory=True)
+    # Links back to a parent are entered once, not looped through
+    (start_path / 'loop').symlink_to(start_path, target_is_directory=True)
+    (tmp_path / 'external' / 'up').symlink_to(tmp_path / 'project', target_is_directory=True)
+    fm = FileManagerDynamic(ceiling_directory=str(tmp_path / 'project'))
+    FileManagerDynamic.clear_search_cache()
+
+    assert fm.search('data', str(start_path), 'folder') == str(start_path / 'shared' / 'data')
+    assert fm.search('missing', str(start_path), 'folder') is None
+
+def test_column_store_round_trip(tmp_path):
+    data = pd.DataFrame({
+        'Epoch': np.arange(4, dtype=np.int64),
+        'Price': [1.5, np.nan, 2.0, 3.0],
+        'TimeStamp': pd.date_range('2024-01-05 09:28', periods=4, freq='s'),
+        'LocalTime': pd.date_range('2024-01-05 09:28', periods=4, freq='s', tz='America/Toronto'),
+        'Size': pd.array([1, None, 3, 4], dtype='Int64'),
+        'Ratio': pd.array([0.5, None, 1.5, 2.5], dtype='Float64'),
+        'Open': pd.array([True, None, False, True], dtype='boolean'),
+        'Symbol': pd.Categorical(['AAA', 'BBB', 'AAA', 'CCC']),
+    })
+    fms = FileManagerStatic(str(tmp_path))
+    fms.save_column_store('store', data)
+    pd.testing.assert_frame_equal(pickle.loads(pickle.dumps(fms.load_column_store('store'))), data, check_categorical=False)
+    pd.testing.assert_frame_equal(fms.load_column_store('store', columns=['Size', 'LocalTime']), data[['Size', 'LocalTime']])
+
+
+def test_column_store_rejects_unsupported_dtypes(tmp_path):
+    data = pd.DataFrame({'Period': pd.period_range('2024-01', periods=3, freq='M')})
+    with pytest.raises(ValueError):
+        FileManagerStatic(str(tmp_path)).save_column_store('store', data)
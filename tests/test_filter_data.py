@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+
+from utils.filter_data import FilterData
+from utils.find_patterns import FindPatterns
+
+
+def make_frame(n=200, seed=0):
+    rng = np.random.default_rng(seed)
+    epoch = pd.Timestamp('2024-01-05 09:28:00').value + np.sort(rng.integers(0, 240 * 10**9, n))
+    return pd.DataFrame({
+        'TimeStamp': pd.to_datetime(epoch).astype(str),
+        'TimeStampEpoch': epoch,
+        'OrderID': [f'order_{i}' for i in range(n)],
+        'MessageType': 'NewOrderRequest',
+        'Symbol': rng.choice(['AAA', 'BBB', 'CCC'], n),
+        'Exchange': rng.choice(['Exchange_1', 'Exchange_2'], n),
+    })
+
+
+def test_verified_frame_is_not_copied():
+    data = FilterData(make_frame()).data
+    assert FilterData(data).data is data
+
+
+def test_reordered_frames_are_sorted_again():
+    data = FilterData(make_frame()).data
+    for reordered in (data.sort_values('Symbol'), pd.concat([data.iloc[100:], data.iloc[:100]])):
+        verified = FilterData(reordered).data
+        assert verified['TimeStamp'].is_monotonic_increasing
+        assert len(verified) == len(data)
+
+
+def test_sequence_filter_uses_given_find_patterns():
+    data = FilterData(make_frame()).data
+    df_subset = data[data['Symbol'].isin(['AAA', 'BBB'])]
+    find_patterns = FindPatterns(data).subset(df_subset)
+    find_patterns._compute_grouped = None  # the masked grouping must be used, not a new one
+    filtered = FilterData(df_subset, find_patterns).filter_by_message_type_sequence([['NewOrderRequest']])
+    pd.testing.assert_frame_equal(filtered, df_subset)
@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+
+from utils.filter_data import FilterData
+from utils.find_patterns import FindPatterns, OnlinePatternCounter, SEQUENCE_SEPARATOR
+
+
+SEQUENCES = [
+    ['NewOrderRequest', 'NewOrderAcknowledged', 'CancelRequest', 'CancelAcknowledged', 'Cancelled'],
+    ['NewOrderRequest', 'NewOrderAcknowledged', 'Trade'],
+    ['NewOrderRequest', 'NewOrderAcknowledged', 'Trade', 'Trade'],
+    ['NewOrderRequest', 'Rejected'],
+    ['NewOrderRequest', 'NewOrderAcknowledged'],
+    ['CancelRequest', 'CancelAcknowledged', 'Cancelled'],
+]
+
+
+def make_feed(n_orders=300, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in rng.permutation(n_orders):
+        sequence = SEQUENCES[rng.integers(len(SEQUENCES))]
+        start = int(rng.integers(0, 10**9))
+        for step, message_type in enumerate(sequence):
+            rows.append((start + step * 1000, f'order_{i:04d}', message_type, f'SYM{i % 7}', f'Exchange_{i % 3 + 1}'))
+    df = pd.DataFrame(rows, columns=['TimeStampEpoch', 'OrderID', 'MessageType', 'Symbol', 'Exchange'])
+    return df.sort_values('TimeStampEpoch', kind='stable').reset_index(drop=True)
+
+
+def test_chunks_match_in_memory():
+    for seed, n_orders in ((0, 300), (1, 12), (2, 6)):
+        df = make_feed(n_orders, seed)
+        expected = FindPatterns(df).find_and_count_patterns()
+        chunks = (df.iloc[start:start + 37] for start in range(0, len(df), 37))
+        assert FindPatterns.find_and_count_patterns_in_chunks(chunks) == expected
+
+
+def test_top_tickers_from_chunks():
+    df = make_feed()
+    chunks = [df.iloc[start:start + 50] for start in range(0, len(df), 50)]
+    for column in ('OrderID', 'MessageType'):
+        counts = df.groupby('Symbol')[column].nunique()
+        top = FilterData.top_tickers_from_chunks(chunks, 3, column)
+        assert sorted(counts[top]) == sorted(counts.nlargest(3))
+
+
+def brute_force_query(grouped, prefix=None, contains=None, min_length=None, max_length=None):
+    matches = set()
+    for order_id, sequence in zip(grouped['OrderID'], grouped['Sequence']):
+        sequence = sequence.split(SEQUENCE_SEPARATOR)
+        if prefix is not None and sequence[:len(prefix)] != list(prefix):
+            continue
+        if contains is not None and not any(sequence[i:i + len(contains)] == list(contains)
+                                            for i in range(len(sequence) - len(contains) + 1)):
+            continue
+        if min_length is not None and len(sequence) < min_length:
+            continue
+        if max_length is not None and len(sequence) > max_length:
+            continue
+        matches.add(order_id)
+    return matches
+
+
+def test_trie_query_matches_brute_force():
+    df = make_feed(n_orders=400, seed=3)
+    find_patterns = FindPatterns(df)
+    index = find_patterns.trie_index()
+    grouped = find_patterns._group_by_order_id()
+    assert brute_force_query(grouped, contains=['Trade', 'Trade']) and brute_force_query(grouped, prefix=['CancelRequest'])
+
+    prefixes = [None, [], ['NewOrderRequest'], ['NewOrderRequest', 'NewOrderAcknowledged', 'Trade'],
+                ['CancelRequest'], ['Unknown']]
+    contains = [None, ['Trade'], ['Trade', 'Trade'], ['NewOrderAcknowledged', 'Trade'],
+                ['CancelAcknowledged', 'Cancelled'], ['Rejected'], ['Unknown']]
+    lengths = [(None, None), (3, None), (None, 2), (3, 4), (6, 6)]
+    for prefix in prefixes:
+        for run in contains:
+            for min_length, max_length in lengths:
+                expected = brute_force_query(grouped, prefix, run, min_length, max_length)
+                assert index.query(prefix, run, min_length, max_length) == expected, (prefix, run, min_length, max_length)
+
+
+def test_subset_keeps_whole_orders_only():
+    df = make_feed(n_orders=200, seed=4)
+    full = FindPatterns(df)
+    for df_subset in (df[df['Symbol'].isin(['SYM1', 'SYM2'])], df[df['MessageType'] != 'Cancelled']):
+        expected = FindPatterns(df_subset.copy())._compute_grouped()[['OrderID', 'Sequence']]
+        subset = full.subset(df_subset)
+        pd.testing.assert_frame_equal(subset._group_by_order_id().reset_index(drop=True), expected)
+        # A fresh instance over the same rows does not pick up a masked grouping
+        counts, _ = FindPatterns(df_subset).find_and_count_patterns()
+        assert sum(counts.values()) == expected['OrderID'].nunique()
+        _, mapping = FindPatterns(df_subset).find_and_count_patterns()
+        assert set(mapping) == set(expected['Sequence'])
+
+
+def test_online_counter_matches_find_patterns():
+    # Orders arriving in reverse OrderID order, with tied counts
+    df = pd.DataFrame({'OrderID': ['b', 'a'], 'MessageType': ['Cancelled', 'NewOrderRequest']})
+    for df in (df, make_feed(n_orders=12, seed=1), make_feed(n_orders=300, seed=5)):
+        counter = OnlinePatternCounter()
+        counter.update_frame(df)
+        find_patterns = FindPatterns(df)
+        assert counter.find_and_count_patterns() == find_patterns.find_and_count_patterns()
+        pd.testing.assert_series_equal(counter.map_order_id_to_pattern().sort_index(),
+                                       find_patterns.map_order_id_to_pattern().sort_index())
+
+
+def test_online_counter_counts_between_updates():
+    df = make_feed(n_orders=200, seed=6)
+    counter = OnlinePatternCounter()
+    for end in range(0, len(df), 97):
+        counter.update_frame(df.iloc[end:end + 97])
+        seen = df.iloc[:end + 97]
+        assert counter.find_and_count_patterns() == FindPatterns(seen).find_and_count_patterns()
+
+
+def test_online_counter_state_follows_live_orders():
+    # Every order moves on from NewOrderRequest, most of them on to Cancelled
+    counter = OnlinePatternCounter()
+    order_ids = [f'order_{i:05d}' for i in range(2000)]
+    for message_type in ('NewOrderRequest', 'NewOrderAcknowledged'):
+        for order_id in order_ids:
+            counter.update(order_id, message_type)
+    for order_id in order_ids[:-20]:
+        counter.update(order_id, 'Cancelled')
+
+    sizes = {counter.sequences[node]: len(members) for node, members in enumerate(counter.members)}
+    assert sizes == {'': 0, 'NewOrderRequest': 0, 'NewOrderRequest -> NewOrderAcknowledged': 20,
+                     'NewOrderRequest -> NewOrderAcknowledged -> Cancelled': 1980}
+    assert sum(sizes.values()) == len(counter.order_nodes)
+    assert counter.pattern_counts() == {'NewOrderRequest -> NewOrderAcknowledged -> Cancelled': 1980,
+                                        'NewOrderRequest -> NewOrderAcknowledged': 20}
+    assert counter.min_order_ids[counter.transitions[(1, 'NewOrderAcknowledged')]] == 'order_01980'
@@ -0,0 +1,61 @@
+import pandas as pd
+import pytest
+
+from test_detect_all import make_feed
+from utils.FishFish import Exchange, FrequencyCounter
+
+
+@pytest.fixture(scope='module')
+def feed():
+    return make_feed(seed=1)
+
+
+def expected_counts(df, granularity, start, end):
+    # Messages of the session window counted per exchange, floored time bucket and message type
+    timestamps = pd.to_datetime(df['TimeStampEpoch'])
+    in_window = (timestamps >= pd.Timestamp(start)) & (timestamps <= pd.Timestamp(end))
+    df = df[in_window]
+    counts = df.groupby([df['Exchange'], timestamps[in_window].dt.floor(granularity).rename('TimeKey'), df['MessageType']]).size()
+    return counts.sort_index()
+
+
+def counter_counts(counter):
+    counts = counter.table().stack()
+    counts = counts[counts > 0].rename_axis(['Exchange', 'TimeKey', 'MessageType'])
+    return counts.sort_index()
+
+
+def test_update_matches_update_frame(feed):
+    counter = FrequencyCounter('250ms')
+    for event in Exchange(feed).events(feed):
+        counter.update(event)
+    framed = FrequencyCounter('250ms')
+    framed.update_frame(feed)
+    pd.testing.assert_frame_equal(counter.table(), framed.table())
+
+
+@pytest.mark.parametrize('start', [Exchange.FREQUENCY_INTERVAL_START, pd.Timestamp('2024-01-05 09:28:01.130')])
+def test_rollups_match_groupby(feed, start):
+    end = Exchange.FREQUENCY_INTERVAL_END
+    counter = FrequencyCounter('250ms', start=start, end=end)
+    counter.update_frame(feed)
+    pd.testing.assert_series_equal(counter_counts(counter), expected_counts(feed, '250ms', start, end), check_names=False)
+    if start != Exchange.FREQUENCY_INTERVAL_START:
+        # The first 1min bucket starts before the window, the messages before start are not in it
+        first_minute = expected_counts(feed, '1min', Exchange.FREQUENCY_INTERVAL_START, end).xs(pd.Timestamp('2024-01-05 09:28'), level='TimeKey')
+        assert first_minute.sum() > expected_counts(feed, '1min', start, end).xs(pd.Timestamp('2024-01-05 09:28'), level='TimeKey').sum()
+    for granularity in ('1s', '1min'):
+        rolled = counter.rollup(granularity)
+        pd.testing.assert_series_equal(counter_counts(rolled), expected_counts(feed, granularity, start, end), check_names=False)
+    with pytest.raises(ValueError):
+        counter.rollup('300ms')
+
+
+def test_table_matches_price_frequency_table(feed):
+    for granularity in ('1s', '250ms'):
+        counter = FrequencyCounter(granularity)
+        counter.update_frame(feed)
+        expected = Exchange(feed).price_frequency_table(feed, granularity)
+        pd.testing.assert_frame_equal(counter.table(), expected, check_names=False, check_column_type=False)
+    rolled = counter.rollup('1s').table()
+    pd.testing.assert_frame_equal(rolled, Exchange(feed).price_frequency_table(feed, '1s'), check_names=False, check_column_type=False)
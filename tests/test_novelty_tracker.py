@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from test_detect_all import make_feed
+from utils.FishFish import Exchange, NoveltyTracker
+
+
+START = pd.Timestamp('2024-01-05 09:28:00').value
+SECOND = 10**9
+
+
+def make_warmup_edge_feed():
+    # 21 NewOrderRequest one second apart, then a record gap landing on the end of the 1 minute warmup
+    # (not flagged), 1ns after it (flagged) or well after it
+    last_gaps = {('Exchange_1', 'AAA'): [60 * SECOND, 60 * SECOND + 1, 120 * SECOND],
+                 ('Exchange_2', 'AAA'): [60 * SECOND + 1],
+                 ('Exchange_2', 'BBB'): [60 * SECOND],
+                 ('Exchange_3', 'CCC'): [90 * SECOND],
+                 ('Exchange_3', 'Novelty'): [100 * SECOND]}
+    rows = []
+    for (exchange, symbol), last_times in last_gaps.items():
+        # The first message of CCC is a cancel, it still initializes the symbol
+        first_type = 'CancelRequest' if symbol == 'CCC' else 'NewOrderRequest'
+        times = [i * SECOND for i in range(21)] + last_times
+        for i, offset in enumerate(times):
+            message_type = first_type if i == 0 else 'NewOrderRequest'
+            rows.append((START + offset, 'NBFToExchange', f'{exchange}_{symbol}_{i}', message_type, symbol, 10.0, exchange))
+    df = pd.DataFrame(rows, columns=['TimeStampEpoch', 'Direction', 'OrderID', 'MessageType', 'Symbol', 'OrderPrice', 'Exchange'])
+    df = df.sort_values('TimeStampEpoch', kind='stable').reset_index(drop=True)
+    df.insert(0, 'TimeStamp', pd.to_datetime(df['TimeStampEpoch']).astype(str))
+    return df
+
+
+def reference_novelty(df, warmup_end_ns):
+    # The original novelSymbol statistics in a dict per symbol per exchange, with the flagged symbols kept apart
+    symbol_counts, novelty, flags = {}, {}, []
+    for row in df.itertuples(index=False):
+        counts = symbol_counts.setdefault(row.Exchange, {})
+        timestamp, epoch = pd.Timestamp(row.TimeStamp).value, int(row.TimeStampEpoch)
+        if row.Symbol not in counts:
+            counts[row.Symbol] = {'HighestTimeDiff': 0, 'Count': 1, 'LastTradeTime': epoch}
+        elif row.MessageType == 'NewOrderRequest':
+            stats = counts[row.Symbol]
+            time_diff = epoch - stats['LastTradeTime']
+            stats['LastTradeTime'] = epoch
+            stats['Count'] += 1
+            if time_diff > stats['HighestTimeDiff']:
+                stats['HighestTimeDiff'] = time_diff
+                if stats['Count'] > 20 and timestamp > warmup_end_ns:
+                    novelty.setdefault(row.Exchange, set()).add(row.Symbol)
+        flags.append(any(row.Symbol in symbols for symbols in novelty.values()))
+    return flags, novelty
+
+
+@pytest.mark.parametrize('df', [make_warmup_edge_feed(), make_feed(seed=2)], ids=['warmup_edge', 'random'])
+def test_tracker_matches_novel_symbol(df):
+    exchange = Exchange(df)
+    first_timestamp = pd.to_datetime(df['TimeStamp']).iloc[0]
+    warmup_end_ns = exchange._warmup_end_ns(first_timestamp)
+
+    reference, novelty = reference_novelty(df, warmup_end_ns)
+    tracker = NoveltyTracker()
+    symbol_counts = None
+    tracked, driven = [], []
+    for event in exchange.events(df):
+        tracker.update(event, warmup_end_ns)
+        symbol_counts = exchange.novelSymbol(symbol_counts, event, first_timestamp)
+        tracked.append(tracker.is_novel(event.symbol))
+        driven.append(symbol_counts.is_novel(event.symbol))
+
+    assert any(reference)
+    np.testing.assert_array_equal(tracked, reference)
+    np.testing.assert_array_equal(driven, reference)
+    np.testing.assert_array_equal(NoveltyTracker.batch_flags(df, warmup_end_ns), reference)
+    for name in df['Exchange'].unique():
+        assert tracker.novel_symbols(name) == symbol_counts.novel_symbols(name) == novelty.get(name, set())
+    assert tracker.novel_symbols() == set().union(*novelty.values())
+
+def test_warmup_edge_flags():
+    df = make_warmup_edge_feed()
+    tracker = NoveltyTracker()
+    exchange = Exchange(df)
+    warmup_end_ns = exchange._warmup_end_ns(pd.to_datetime(df['TimeStamp']).iloc[0])
+    for event in exchange.events(df):
+        tracker.update(event, warmup_end_ns)
+    assert tracker.novel_symbols('Exchange_1') == {'AAA'}
+    assert tracker.novel_symbols('Exchange_2') == {'AAA'}
+    assert tracker.novel_symbols('Exchange_3') == {'CCC', 'Novelty'}
+    assert not tracker.is_novel('BBB')
@@ -0,0 +1,59 @@
+import gc
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from utils import utils
+from utils.utils import TimeWindowIndex
+
+
+def make_frame(n=1000, shuffle=False, seed=0):
+    rng = np.random.default_rng(seed)
+    times = pd.Timestamp('2024-01-05 09:28:00') + pd.to_timedelta(np.sort(rng.integers(0, 240 * 10**9, n)), unit='ns')
+    df = pd.DataFrame({'TimeStamp': times.astype(str), 'Value': np.arange(n)})
+    if shuffle:
+        df = df.sample(frac=1, random_state=seed)
+    return df
+
+
+def test_window_matches_mask():
+    for shuffle in (False, True):
+        df = make_frame(shuffle=shuffle)
+        times = pd.to_datetime(df['TimeStamp'])
+        index = TimeWindowIndex.for_dataset(df)
+        start = pd.Timestamp('2024-01-05 09:29:00')
+        end = start + pd.Timedelta(1, unit='s') * 30
+        expected = df[(times >= start) & (times < end)].sort_values('TimeStamp', kind='stable')
+        pd.testing.assert_frame_equal(index.window(start, end), expected)
+
+
+def test_frame_is_garbage_collected():
+    frames = [make_frame(seed=seed) for seed in range(5)]
+    references = []
+    for df in frames:
+        TimeWindowIndex.for_dataset(df)
+        references.append(weakref.ref(df))
+    del df, frames
+    gc.collect()
+    assert all(reference() is None for reference in references)
+    assert not any(entry[0]() is not None for entry in TimeWindowIndex._cache.values())
+
+
+def test_cache_is_bounded():
+    frames = [make_frame(n=10, seed=seed) for seed in range(TimeWindowIndex.CACHE_SIZE + 3)]
+    for df in frames:
+        TimeWindowIndex.for_dataset(df)
+    assert len(TimeWindowIndex._cache) <= TimeWindowIndex.CACHE_SIZE
+    assert TimeWindowIndex.for_dataset(frames[-1]) is TimeWindowIndex.for_dataset(frames[-1])
+
+
+
+def test_3d_replay_of_an_empty_filter(monkeypatch):
+    charts = []
+    monkeypatch.setattr(utils.st, 'plotly_chart', lambda fig, **kwargs: charts.append(fig))
+    df = pd.DataFrame({column: pd.Series(dtype=object) for column in ('TimeStamp', 'Exchange', 'Symbol', 'PatternID')})
+    utils.display_data_3d_over_time(df)
+    (fig,) = charts
+    assert len(fig.data) == len(fig.frames) == 241
+    assert all(len(trace.x) == 0 for trace in fig.data)